@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Time extract against the number of DSNs.
+
+Compares the single concat now used by wdmtoolbox.extract with joining
+the DSNs one at a time, which is how extract used to assemble its result.
+
+    python benchmarks/bench_extract.py [--values 35040] 10 50 100 200
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from wdmtoolbox import wdmtoolbox
+
+
+def make_wdm(wdmpath, ndsns, nvalues):
+    """Create a WDM file of 15 minute DSNs with staggered start dates."""
+    wdmtoolbox.createnewwdm(wdmpath, overwrite=True)
+    for dsn in range(1, ndsns + 1):
+        wdmtoolbox.createnewdsn(wdmpath, dsn, tcode=2, tsstep=15,
+                                base_year=1990)
+        index = pd.date_range('2000-01-01', periods=nvalues, freq='15T')
+        index = index + pd.Timedelta(minutes=15 * (dsn % 96))
+        data = pd.DataFrame(pd.np.random.rand(nvalues).round(2),
+                            index=index)
+        wdmtoolbox.WDM.write_dsn(wdmpath, dsn, data)
+
+
+def join_one_at_a_time(wdmpath, dsns):
+    """The previous extract assembly."""
+    for index, dsn in enumerate(dsns):
+        nts = wdmtoolbox.WDM.read_dsn(wdmpath, dsn)
+        if index == 0:
+            result = nts
+        else:
+            result = result.join(nts, how='outer')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('counts', type=int, nargs='*',
+                        default=[10, 50, 100, 200])
+    parser.add_argument('--values', type=int, default=35040,
+                        help='values in each DSN, default one year')
+    args = parser.parse_args()
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        wdmpath = os.path.join(tempdir, 'bench.wdm')
+        make_wdm(wdmpath, max(args.counts), args.values)
+        print('{0:>6} {1:>10} {2:>10}'.format('DSNS', 'CONCAT', 'JOIN'))
+        for count in args.counts:
+            dsns = list(range(1, count + 1))
+
+            start = time.time()
+            wdmtoolbox.extract(wdmpath, *dsns)
+            concat = time.time() - start
+
+            start = time.time()
+            join_one_at_a_time(wdmpath, dsns)
+            join = time.time() - start
+
+            print('{0:>6} {1:>9.3f}s {2:>9.3f}s'.format(count, concat, join))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main()
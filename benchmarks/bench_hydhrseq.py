@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Time reading HYDHR sequential files of increasing length.
+
+Writes a synthetic hourly HYDHR file for each number of years and reports
+the lines per second read by the hydhrseqtowdm parser.
+
+    python benchmarks/bench_hydhrseq.py [10 25 50]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from wdmtoolbox import wdmtoolbox
+
+
+def make_hydhrseq(filename, years):
+    """Write `years` of random hourly values starting in 1950."""
+    random = pd.np.random.RandomState(0)
+    with open(filename, 'w') as fpo:
+        for date in pd.date_range('1950-01-01', periods=int(years * 365.25)):
+            for flag in [1, 2]:
+                values = ' '.join('{0:6.2f}'.format(i)
+                                  for i in random.rand(12))
+                fpo.write('STATION1{0:3d}{1:3d}{2:3d}{3:2d} {4}\n'.format(
+                    date.year % 100, date.month, date.day, flag, values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('years', type=int, nargs='*', default=[10, 25, 50])
+    args = parser.parse_args()
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        print('{0:>6} {1:>10} {2:>10} {3:>14}'.format('YEARS', 'LINES',
+                                                      'SECONDS', 'LINES/S'))
+        for years in args.years:
+            filename = os.path.join(tempdir, 'hydhr.txt')
+            make_hydhrseq(filename, years)
+            start = time.time()
+            with open(filename) as fpi:
+                data = wdmtoolbox._read_hydhrseq(fpi)
+            seconds = time.time() - start
+            lines = len(data) // 12
+            print('{0:>6} {1:>10} {2:>10.3f} {3:>14.0f}'.format(
+                years, lines, seconds, lines / seconds))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""Time the start up of wdmtoolbox against a budget.
+
+Runs 'python -X importtime' on the import of wdmtoolbox.wdmtoolbox, and
+times 'describedsn' in a new interpreter.  Exits with 1 if the median
+import time is over the budget or 'describedsn' imports PANDAS,
+tstoolbox, or dateutil, so it can be used to catch start up regressions.
+Needs Python 3.7 or later for '-X importtime'.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--budget 150]
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from wdmtoolbox import wdmtoolbox
+
+HEAVY = ['pandas', 'tstoolbox', 'dateutil']
+
+# Run in a new interpreter.  Prints the modules that the import of
+# wdmtoolbox and the command added to sys.modules.
+CHILD = """
+import json
+import sys
+before = set(sys.modules)
+from wdmtoolbox import wdmtoolbox
+sys.argv = ['wdmtoolbox'] + {0!r}
+wdmtoolbox.main()
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+
+def import_time():
+    """Return the import time of wdmtoolbox.wdmtoolbox in ms.
+
+    Returns None if the interpreter does not print the import times.
+    """
+    proc = subprocess.Popen([sys.executable, '-X', 'importtime', '-c',
+                             'import wdmtoolbox.wdmtoolbox'],
+                            stderr=subprocess.PIPE)
+    _, err = proc.communicate()
+    for line in err.decode().splitlines():
+        # import time: self [us] | cumulative | imported package
+        words = line.split('|')
+        if len(words) != 3 or not words[1].strip().isdigit():
+            continue
+        if words[2].strip() == 'wdmtoolbox.wdmtoolbox':
+            return int(words[1]) / 1000.0
+    return None
+
+
+def imported(*args):
+    """Return the top level modules that a wdmtoolbox command imports."""
+    out = subprocess.check_output([sys.executable, '-c',
+                                   CHILD.format(list(args))])
+    return set(i.split('.')[0]
+               for i in json.loads(out.decode().splitlines()[-1]))
+
+
+def median(values):
+    """Return the middle of values."""
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=150,
+                        help='milliseconds allowed for the import')
+    args = parser.parse_args()
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        wdmpath = os.path.join(tempdir, 'bench.wdm')
+        wdmtoolbox.createnewwdm(wdmpath, overwrite=True)
+        wdmtoolbox.createnewdsn(wdmpath, 101, tcode=2, tsstep=15,
+                                base_year=1990)
+
+        imports = []
+        for _ in range(args.repeat):
+            total = import_time()
+            if total is None:
+                sys.exit("""
+*
+*   No import time was found in the output of
+*   '{0} -X importtime'.  It needs Python 3.7 or later.
+*
+""".format(sys.executable))
+            imports.append(total)
+
+        modules = imported('describedsn', wdmpath, '101')
+
+        commands = []
+        for _ in range(args.repeat):
+            start = time.time()
+            subprocess.check_call([sys.executable, '-m',
+                                   'wdmtoolbox.wdmtoolbox', 'describedsn',
+                                   wdmpath, '101'],
+                                  stdout=open(os.devnull, 'w'))
+            commands.append((time.time() - start) * 1000)
+    finally:
+        shutil.rmtree(tempdir)
+
+    heavy = [i for i in HEAVY if i in modules]
+    print('{0:<24} {1:>9.1f}ms (budget {2:.0f}ms)'.format(
+        'import', median(imports), args.budget))
+    print('{0:<24} {1:>9.1f}ms'.format('describedsn', median(commands)))
+    if heavy:
+        print('Imported by describedsn: {0}'.format(', '.join(heavy)))
+    if heavy or median(imports) > args.budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,7 @@ except:
     from io import StringIO
 
 from pandas.util.testing import TestCase
+from pandas.util.testing import assert_frame_equal
 from pandas.util.testing import assertRaisesRegexp
 
 from wdmtoolbox import wdmtoolbox
@@ -61,3 +62,26 @@ class TestDescribe(TestCase):
         wdmtoolbox.cleancopywdm(self.wdmname, twdmname, overwrite=True)
         os.remove(twdmname)
 
+
+    def test_cleancopy_values(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.createnewdsn(self.wdmname, 102, tcode=3,
+                                base_year=1970, tsstep=1)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        tfd, twdmname = tempfile.mkstemp(suffix='.wdm')
+        os.close(tfd)
+        try:
+            wdmtoolbox.cleancopywdm(self.wdmname, twdmname, overwrite=True)
+            self.assertEqual(wdmtoolbox.WDM.list_dsns(twdmname), [101, 102])
+            ret1 = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+            ret2 = wdmtoolbox.WDM.read_dsn(twdmname, 101)
+            ret2.columns = ret1.columns
+            assert_frame_equal(ret1, ret2)
+            self.assertEqual(
+                wdmtoolbox.WDM.describe_dsn(twdmname, 102)['start_date'],
+                None)
+        finally:
+            os.remove(twdmname)
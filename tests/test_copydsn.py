@@ -71,3 +71,22 @@ class TestDescribe(TestCase):
         wdmtoolbox.createnewwdm(self.awdmname, overwrite=True)
         wdmtoolbox.copydsn(self.wdmname, 101, self.awdmname, 1101)
 
+
+    def test_copy_within_file(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15,
+                                location='BASIN1')
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        wdmtoolbox.copydsn(self.wdmname, 101, self.wdmname, 1101)
+        self.assertEqual(wdmtoolbox.WDM.list_dsns(self.wdmname), [101, 1101])
+        desc1 = wdmtoolbox.WDM.describe_dsn(self.wdmname, 101)
+        desc2 = wdmtoolbox.WDM.describe_dsn(self.wdmname, 1101)
+        for key in desc1:
+            if key != 'dsn':
+                self.assertEqual(str(desc1[key]), str(desc2[key]))
+        ret1 = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+        ret2 = wdmtoolbox.WDM.read_dsn(self.wdmname, 1101)
+        ret2.columns = ret1.columns
+        assert_frame_equal(ret1, ret2)
@@ -76,3 +76,66 @@ class TestDescribe(TestCase):
         with assertRaisesRegexp(DSNExistsError, 'exists.'):
             wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=5,
                                     base_year=1870)
+
+    def test_createnewdsns(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=5,
+                                base_year=1870)
+        fd, manifest = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            with open(manifest, 'w') as fpo:
+                fpo.write('dsn,tcode,tsstep,base_year,location,constituent\n')
+                fpo.write('102,3,1,1970,BASIN1,FLOW\n')
+                fpo.write('101,3,1,1970,,\n')
+                fpo.write('103,4,,,TOOLONGNAME,\n')
+                fpo.write('104,2,15,,,\n')
+            with assertRaisesRegexp(ValueError, '2 of the 4 DSNs'):
+                wdmtoolbox.createnewdsns(self.wdmname, manifest)
+        finally:
+            os.remove(manifest)
+        self.assertEqual(wdmtoolbox.WDM.list_dsns(self.wdmname),
+                         [101, 102, 104])
+        desc = wdmtoolbox.WDM.describe_dsn(self.wdmname, 102)
+        self.assertEqual(desc['tcode'], 3)
+        self.assertEqual(desc['location'], 'BASIN1')
+        self.assertEqual(desc['constituent'], 'FLOW')
+        desc = wdmtoolbox.WDM.describe_dsn(self.wdmname, 104)
+        self.assertEqual(desc['tstep'], 15)
+        self.assertEqual(desc['base_year'], 1900)
+
+        errors = wdmtoolbox.WDM.create_many_dsns(self.wdmname,
+                                                 [{'dsn': 105},
+                                                  {'dsn': 102},
+                                                  {'tcode': 4}])
+        self.assertEqual([i[:2] for i in errors], [[1, 102], [2, None]])
+
+        # Numbers are taken as strings for the string attributes.
+        errors = wdmtoolbox.WDM.create_many_dsns(self.wdmname,
+                                                 [{'dsn': 106,
+                                                   'location': 2246000,
+                                                   'statid': 12},
+                                                  {'dsn': 107,
+                                                   'scenario': 123456789},
+                                                  {'dsn': 108}])
+        self.assertEqual([i[:2] for i in errors], [[1, 107]])
+        self.assertTrue('too long' in errors[0][2])
+        self.assertEqual(wdmtoolbox.WDM.list_dsns(self.wdmname),
+                         [101, 102, 104, 105, 106, 108])
+        self.assertEqual(
+            wdmtoolbox.WDM.describe_dsn(self.wdmname, 106)['location'],
+            '2246000')
+
+        fd, manifest = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            with open(manifest, 'w') as fpo:
+                fpo.write('dsn,tcode\n')
+                fpo.write('109,4,extra\n')
+                fpo.write('110,4\n')
+            with assertRaisesRegexp(ValueError, 'more fields than'):
+                wdmtoolbox.createnewdsns(self.wdmname, manifest)
+        finally:
+            os.remove(manifest)
+        self.assertEqual(wdmtoolbox.WDM.list_dsns(self.wdmname),
+                         [101, 102, 104, 105, 106, 108, 110])
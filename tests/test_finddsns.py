@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_finddsns
+----------------------------------
+
+Tests for `wdmtoolbox` module.
+"""
+
+import os
+import tempfile
+
+from pandas.util.testing import TestCase
+
+from wdmtoolbox import wdmtoolbox
+from wdmtoolbox import catalog
+
+
+class TestDescribe(TestCase):
+    def setUp(self):
+        self.fd, self.wdmname = tempfile.mkstemp(suffix='.wdm')
+        os.close(self.fd)
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        for dsn, scenario, location in [(101, 'OBSERVED', 'BASIN1'),
+                                        (102, 'OBSERVED', 'BASIN2'),
+                                        (103, 'SIMULATE', 'BASIN1')]:
+            wdmtoolbox.createnewdsn(self.wdmname, dsn, tcode=2,
+                                    base_year=1970, tsstep=15,
+                                    scenario=scenario, location=location,
+                                    constituent='FLOW')
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+
+    def tearDown(self):
+        os.remove(self.wdmname)
+        if os.path.exists(catalog.catalog_path(self.wdmname)):
+            os.remove(catalog.catalog_path(self.wdmname))
+
+    def test_finddsns(self):
+        ret1 = wdmtoolbox.finddsns(self.wdmname, scenario='observed',
+                                   constituent='FLOW')
+        self.assertEqual(sorted(ret1), [101, 102])
+        self.assertTrue(os.path.exists(catalog.catalog_path(self.wdmname)))
+        ret2 = wdmtoolbox.finddsns(self.wdmname, location='BASIN1')
+        self.assertEqual(sorted(ret2), [101, 103])
+        self.assertEqual(wdmtoolbox.finddsns(self.wdmname,
+                                             location='BASIN3'), {})
+
+    def test_listdsns_catalog(self):
+        ret1 = wdmtoolbox.listdsns(self.wdmname)
+        ret2 = wdmtoolbox.listdsns(self.wdmname, catalog=True)
+        self.assertEqual(sorted(ret1), sorted(ret2))
+        for dsn in ret1:
+            for key in ret1[dsn]:
+                if key in ['llsdat', 'lledat']:
+                    self.assertEqual(list(ret1[dsn][key]), ret2[dsn][key])
+                else:
+                    self.assertEqual(ret1[dsn][key], ret2[dsn][key])
+
+    def test_catalog_rebuild(self):
+        self.assertEqual(sorted(wdmtoolbox.finddsns(self.wdmname)),
+                         [101, 102, 103])
+        wdmtoolbox.deletedsn(self.wdmname, 102)
+        self.assertEqual(sorted(wdmtoolbox.finddsns(self.wdmname)),
+                         [101, 103])
+
+        # A damaged catalog is made again.
+        with open(catalog.catalog_path(self.wdmname), 'w') as fpo:
+            fpo.write('not a catalog')
+        self.assertEqual(sorted(wdmtoolbox.finddsns(self.wdmname)),
+                         [101, 103])
@@ -10,7 +10,9 @@ Tests for `tstoolbox` module.
 
 import sys
 import os
+import subprocess
 import tempfile
+import threading
 try:
     from cStringIO import StringIO
 except:
@@ -76,6 +78,84 @@ class TestDescribe(TestCase):
                             input_ts='tests/nwisiv_02246000.csv')
         ldsns = wdmtoolbox.listdsns(self.wdmname)
 
+    def test_list_dsns(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        for dsn in [32000, 101, 2001]:
+            wdmtoolbox.createnewdsn(self.wdmname, dsn, tcode=2,
+                                    base_year=1970, tsstep=15)
+        self.assertEqual(wdmtoolbox.WDM.list_dsns(self.wdmname),
+                         [101, 2001, 32000])
+        ldsns = wdmtoolbox.listdsns(self.wdmname)
+        self.assertEqual(sorted(ldsns.keys()), [101, 2001, 32000])
+
+    def test_describe_dsns(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15,
+                                location='BASIN1')
+        wdmtoolbox.createnewdsn(self.wdmname, 102, tcode=4,
+                                scenario='observed')
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        descs = wdmtoolbox.WDM.describe_dsns(self.wdmname)
+        self.assertEqual(sorted(descs.keys()), [101, 102])
+        for dsn in [101, 102]:
+            single = wdmtoolbox._describedsn(self.wdmname, dsn)
+            for key in ['start_date', 'end_date', 'tcode', 'tstep',
+                        'location', 'scenario', 'tsfill', 'base_year']:
+                self.assertEqual(descs[dsn][key], single[key])
+        self.assertEqual(descs[101]['location'], 'BASIN1')
+        self.assertEqual(descs[102]['scenario'], 'OBSERVED')
+
+    def test_session(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        wdm = wdmtoolbox.WDM
+        ret1 = wdm.read_dsn(self.wdmname, 101)
+        with wdm.session(self.wdmname) as wdmpath:
+            unit = wdm.openfiles[wdmpath]
+            wdm.describe_dsn(wdmpath, 101)
+            ret2 = wdm.read_dsn(wdmpath, 101)
+            self.assertEqual(wdm.openfiles[wdmpath], unit)
+        self.assertTrue(self.wdmname not in wdm.openfiles)
+        assert_frame_equal(ret1, ret2)
+
+        ret3 = wdmtoolbox.extract(self.wdmname, 101, keep_open=True)
+        assert_frame_equal(ret1, ret3)
+
+    def test_threads(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        wdm = wdmtoolbox.WDM
+        ret1 = wdm.read_dsn(self.wdmname, 101)
+
+        results = []
+        errors = []
+
+        def read():
+            try:
+                for _ in range(5):
+                    results.append(wdm.read_dsn(self.wdmname, 101))
+            except Exception as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 20)
+        for ret2 in results:
+            assert_frame_equal(ret1, ret2)
+        self.assertTrue(self.wdmname not in wdm.openfiles)
+
     def test_negative_dsn(self):
         wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
         wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
@@ -148,3 +228,589 @@ class TestDescribe(TestCase):
                               end_date='2014-02-22 11:00:00').astype('float64')
         ret1.columns = ['02246000_iv_00060']
         assert_frame_equal(ret1, ret3)
+
+    def test_date_window(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        full = wdmtoolbox.extract(self.wdmname, 101)
+        for start_date, end_date in [('2014-02-21 16:00:00', None),
+                                     ('2014-02-21 16:07:00',
+                                      '2014-02-22 11:00:00'),
+                                     (None, '2014-02-21 00:00:00')]:
+            ret1 = wdmtoolbox.extract(self.wdmname, 101,
+                                      start_date=start_date,
+                                      end_date=end_date)
+            assert_frame_equal(ret1, full.loc[start_date:end_date])
+
+    def test_resample(self):
+        import pandas as pd
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=3,
+                                base_year=1970)
+        hourly = pd.DataFrame(
+            {'flow': [float(i % 37) for i in range(24*10)]},
+            index=pd.date_range('2000-01-01', periods=24*10, freq='H'))
+        wdmtoolbox.csvtowdm(self.wdmname, 101, input_ts=hourly)
+        for transform in ['sum', 'mean', 'max', 'min']:
+            ret1 = wdmtoolbox.extract(self.wdmname, 101,
+                                      resample='D',
+                                      transform=transform)
+            ret2 = getattr(hourly.resample('D'), transform)()
+            self.assertEqual(list(ret1.index), list(ret2.index))
+            self.assertTrue(
+                ((ret1.iloc[:, 0] - ret2['flow']).abs() < 1.0e-3).all())
+        with assertRaisesRegexp(ValueError, 'The transform must be one of'):
+            wdmtoolbox.extract(self.wdmname, 101, resample='D',
+                               transform='median')
+
+    def test_iter_dsn(self):
+        import pandas as pd
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        full = wdmtoolbox.extract(self.wdmname, 101)
+        for chunk in [10, 'D']:
+            chunks = list(wdmtoolbox.WDM.iter_dsn(self.wdmname, 101,
+                                                  chunk=chunk))
+            self.assertTrue(len(chunks) > 1)
+            assert_frame_equal(pd.concat(chunks), full)
+        values, start = next(wdmtoolbox.WDM.iter_dsn(self.wdmname, 101,
+                                                     chunk=10,
+                                                     raw=True))
+        self.assertEqual(len(values), 10)
+        self.assertEqual(start, full.index[0])
+
+        # A generator left part way holds neither the file nor its lock.
+        blocks = wdmtoolbox.WDM.iter_dsn(self.wdmname, 101, chunk=10)
+        next(blocks)
+        self.assertTrue(self.wdmname not in wdmtoolbox.WDM.openfiles)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            wdmtoolbox.WDM.read_dsn(self.wdmname, 101)))
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        assert_frame_equal(results[0], full)
+        rest = []
+        thread = threading.Thread(target=lambda: rest.extend(blocks))
+        thread.start()
+        thread.join(10)
+        self.assertEqual(sum(len(i) for i in rest), len(full) - 10)
+
+        ret1 = wdmtoolbox.extract(self.wdmname, 101, chunksize='D')
+        assert_frame_equal(ret1, full)
+
+    def test_extract_jobs(self):
+        fd, wdmname2 = tempfile.mkstemp(suffix='.wdm')
+        os.close(fd)
+        try:
+            for wdmname, dsn in [[self.wdmname, 101], [wdmname2, 102]]:
+                wdmtoolbox.createnewwdm(wdmname, overwrite=True)
+                wdmtoolbox.createnewdsn(wdmname, dsn, tcode=2,
+                                        base_year=1970, tsstep=15)
+                wdmtoolbox.csvtowdm(wdmname, dsn,
+                                    input_ts='tests/nwisiv_02246000.csv')
+            labels = ['{0},102'.format(wdmname2),
+                      '{0},101'.format(self.wdmname)]
+            ret1 = wdmtoolbox.extract(*labels)
+            ret2 = wdmtoolbox.extract(*labels, jobs=2)
+            assert_frame_equal(ret1, ret2)
+            self.assertEqual(list(ret2.columns), list(ret1.columns))
+        finally:
+            os.remove(wdmname2)
+
+    def test_extract_assembly(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        for dsn in [101, 102]:
+            wdmtoolbox.createnewdsn(self.wdmname, dsn, tcode=2,
+                                    base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        ret2 = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+        wdmtoolbox.WDM.write_dsn(self.wdmname, 102, ret2.iloc[100:])
+        ret1 = wdmtoolbox.WDM.read_dsn(self.wdmname, 102)
+        ret3 = wdmtoolbox.extract(self.wdmname, 102, 101)
+        assert_frame_equal(ret3, ret1.join(ret2, how='outer'))
+
+        ret4 = wdmtoolbox.extract(self.wdmname, 102, 101, as_dict=True)
+        self.assertEqual(sorted(ret4), sorted(ret3.columns))
+        for column in ret3.columns:
+            self.assertTrue(ret4[column].equals(ret3[column].dropna()))
+
+    def test_hydhrseqtowdm(self):
+        import pandas as pd
+        lines = []
+        values = []
+        for date in pd.date_range('1999-12-30', '2000-01-02'):
+            for flag in [1, 2]:
+                hours = [len(values) + i for i in range(12)]
+                values.extend(hours)
+                lines.append('STATION1{0:3d}{1:3d}{2:3d}{3:2d} {4}\n'.format(
+                    date.year % 100, date.month, date.day, flag,
+                    ' '.join(str(i) for i in hours)))
+        fd, hydhrname = tempfile.mkstemp(suffix='.txt')
+        os.close(fd)
+        try:
+            with open(hydhrname, 'w') as fpo:
+                fpo.writelines(lines)
+            wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+            wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=3,
+                                    base_year=1970, tsstep=1)
+            wdmtoolbox.hydhrseqtowdm(self.wdmname, 101, input_ts=hydhrname)
+        finally:
+            os.remove(hydhrname)
+        ret1 = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+        self.assertEqual(ret1.index[0], pd.Timestamp('1999-12-30 00:00'))
+        self.assertEqual(ret1.index[-1], pd.Timestamp('2000-01-02 23:00'))
+        self.assertEqual(list(ret1.iloc[:, 0]), values)
+
+        lines[1] = lines[1][:18] + '3' + lines[1][19:]
+        with assertRaisesRegexp(ValueError, 'line 2 has 3'):
+            wdmtoolbox._read_hydhrseq(lines)
+
+    def test_csvtowdm_chunksize(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        for dsn in [101, 102, 103]:
+            wdmtoolbox.createnewdsn(self.wdmname, dsn, tcode=2,
+                                    base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        wdmtoolbox.csvtowdm(self.wdmname, 102,
+                            input_ts='tests/nwisiv_02246000.csv',
+                            chunksize=50)
+        ret1 = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+        ret2 = wdmtoolbox.WDM.read_dsn(self.wdmname, 102)
+        ret1.columns = ret2.columns
+        assert_frame_equal(ret1, ret2)
+
+        with open('tests/nwisiv_02246000.csv') as fpi:
+            lines = fpi.readlines()
+        fd, csvname = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            with open(csvname, 'w') as fpo:
+                fpo.writelines(lines[:60] + lines[55:])
+            with assertRaisesRegexp(ValueError, 'overlaps the data'):
+                wdmtoolbox.csvtowdm(self.wdmname, 103, input_ts=csvname,
+                                    chunksize=59)
+        finally:
+            os.remove(csvname)
+
+    def test_append_dsn(self):
+        import pandas as pd
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=3,
+                                base_year=1970, tsstep=1)
+        data = pd.DataFrame(pd.np.arange(48.0),
+                            index=pd.date_range('2000-01-01',
+                                                periods=48,
+                                                freq='H'))
+        wdm = wdmtoolbox.WDM
+        self.assertEqual(wdm.append_dsn(self.wdmname, 101, data[:10]), 10)
+        self.assertEqual(wdm.append_dsn(self.wdmname, 101, data[5:20]), 10)
+        self.assertEqual(wdm.append_dsn(self.wdmname, 101, data[:20]), 0)
+        self.assertEqual(wdm.append_dsn(self.wdmname, 101, data[30:]), 18)
+        # Rows that fall in a gap before the last value are not new.
+        self.assertEqual(wdm.append_dsn(self.wdmname, 101, data[15:25]), 0)
+        ret1 = wdm.read_dsn(self.wdmname, 101)
+        self.assertEqual(list(ret1.index), list(data.index))
+        self.assertTrue(ret1.iloc[20:30, 0].isnull().all())
+        self.assertEqual(list(ret1.iloc[:20, 0]), list(data.iloc[:20, 0]))
+        self.assertEqual(list(ret1.iloc[30:, 0]), list(data.iloc[30:, 0]))
+
+    def test_csvtowdm_append(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        for dsn in [101, 102, 103]:
+            wdmtoolbox.createnewdsn(self.wdmname, dsn, tcode=2,
+                                    base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        with open('tests/nwisiv_02246000.csv') as fpi:
+            lines = fpi.readlines()
+        fd, csvname = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            with open(csvname, 'w') as fpo:
+                fpo.writelines(lines[:100])
+            for dsn, chunksize in [[102, None], [103, 30]]:
+                wdmtoolbox.csvtowdm(self.wdmname, dsn, input_ts=csvname)
+                wdmtoolbox.csvtowdm(self.wdmname, dsn,
+                                    input_ts='tests/nwisiv_02246000.csv',
+                                    chunksize=chunksize,
+                                    append=True)
+        finally:
+            os.remove(csvname)
+        ret1 = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+        for dsn in [102, 103]:
+            ret2 = wdmtoolbox.WDM.read_dsn(self.wdmname, dsn)
+            ret2.columns = ret1.columns
+            assert_frame_equal(ret1, ret2)
+
+    def test_write_dsn_overwrite(self):
+        import pandas as pd
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=3,
+                                base_year=1970, tsstep=1)
+        data = pd.DataFrame(pd.np.arange(26304.0),
+                            index=pd.date_range('2000-01-01',
+                                                periods=26304,
+                                                freq='H'))
+        wdm = wdmtoolbox.WDM
+        wdm.write_dsn(self.wdmname, 101, data.copy())
+        window = data['2000-12-25':'2001-01-05'] * -1
+        wdm.write_dsn(self.wdmname, 101, window, overwrite=True)
+        data.loc['2000-12-25':'2001-01-05'] = window
+        ret1 = wdm.read_dsn(self.wdmname, 101)
+        self.assertEqual(list(ret1.index), list(data.index))
+        self.assertTrue((ret1.values == data.values).all())
+
+        # A window before the start of the DSN leaves the data in place.
+        early = pd.DataFrame([1.0, 2.0],
+                             index=pd.date_range('1999-12-25',
+                                                 periods=2,
+                                                 freq='H'))
+        wdm.write_dsn(self.wdmname, 101, early.copy(), overwrite=True)
+        ret3 = wdm.read_dsn(self.wdmname, 101)
+        self.assertEqual(list(ret3.iloc[:2, 0]), [1.0, 2.0])
+        self.assertTrue(ret3.iloc[2:-len(data), 0].isnull().all())
+        self.assertEqual(list(ret3.index[-len(data):]), list(data.index))
+        self.assertTrue((ret3.values[-len(data):] == data.values).all())
+
+        # Without overwrite the data after the window is deleted.
+        wdm.write_dsn(self.wdmname, 101, window)
+        ret2 = wdm.read_dsn(self.wdmname, 101)
+        self.assertEqual(ret2.index[-1], window.index[-1])
+
+        with assertRaisesRegexp(ValueError, 'not both'):
+            wdmtoolbox.csvtowdm(self.wdmname, 101,
+                                input_ts='tests/nwisiv_02246000.csv',
+                                append=True,
+                                overwrite=True)
+
+    def test_write_chunks_overwrite(self):
+        import pandas as pd
+        from wdmtoolbox.wdmutil import WDM
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=3,
+                                base_year=1970, tsstep=1)
+        data = pd.DataFrame(pd.np.arange(26304.0),
+                            index=pd.date_range('2000-01-01',
+                                                periods=26304,
+                                                freq='H'))
+        wdm = WDM()
+        wdm.write_dsn(self.wdmname, 101, data.copy())
+        window = data['2000-06-01':'2000-06-30'] * -1
+        data.loc['2000-06-01':'2000-06-30'] = window
+
+        # The data after the chunks is moved a yearly group at a time, not
+        # read into memory all at once.
+        nvals = []
+        wdtget = wdm._wdtget
+
+        def counted(wdmpath, dsn, sdat, nval, *args, **kwds):
+            nvals.append(nval)
+            return wdtget(wdmpath, dsn, sdat, nval, *args, **kwds)
+        wdm._wdtget = counted
+        wdm.write_chunks(self.wdmname, 101,
+                         [window[i:i + 100]
+                          for i in range(0, len(window), 100)],
+                         overwrite=True)
+        self.assertTrue(0 < max(nvals) <= 8784)
+        self.assertEqual(wdm.list_dsns(self.wdmname), [101])
+        ret1 = wdm.read_dsn(self.wdmname, 101)
+        self.assertEqual(list(ret1.index), list(data.index))
+        self.assertTrue((ret1.values == data.values).all())
+
+        # The data after the chunks that were written is put back when a
+        # later chunk is refused.
+        with assertRaisesRegexp(ValueError, 'overlaps'):
+            wdm.write_chunks(self.wdmname, 101,
+                             [window[:100] * 2, window[50:150]],
+                             overwrite=True)
+        data.loc[window.index[:100]] = window[:100] * 2
+        self.assertEqual(wdm.list_dsns(self.wdmname), [101])
+        ret2 = wdm.read_dsn(self.wdmname, 101)
+        self.assertEqual(list(ret2.index), list(data.index))
+        self.assertTrue((ret2.values == data.values).all())
+
+    def test_csvtowdm_multi(self):
+        with open('tests/nwisiv_02246000.csv') as fpi:
+            lines = fpi.readlines()
+        fd, csvname = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            with open(csvname, 'w') as fpo:
+                fpo.write('Datetime,a,b,c\n')
+                for line in lines[1:]:
+                    date, value = line.strip().split(',')
+                    fpo.write('{0},{1},{2},{3}\n'.format(
+                        date, value, 2 * float(value), 3 * float(value)))
+            wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+            wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                    base_year=1970, tsstep=15)
+            with assertRaisesRegexp(ValueError, 'one DSN for each column'):
+                wdmtoolbox.csvtowdm_multi(self.wdmname, '101,102',
+                                          input_ts=csvname)
+            with assertRaisesRegexp(WDMError, 'does not exist'):
+                wdmtoolbox.csvtowdm_multi(self.wdmname, '101,102,103',
+                                          input_ts=csvname)
+            with assertRaisesRegexp(ValueError, 'given more'):
+                wdmtoolbox.csvtowdm_multi(self.wdmname, '101,101,102',
+                                          input_ts=csvname,
+                                          create=True)
+            # No DSN is created when a column does not fit its DSN.
+            wdmtoolbox.createnewdsn(self.wdmname, 105, tcode=2,
+                                    base_year=1970, tsstep=30)
+            with assertRaisesRegexp(ValueError, 'tstep'):
+                wdmtoolbox.csvtowdm_multi(self.wdmname, '102,105,103',
+                                          input_ts=csvname,
+                                          create=True)
+            self.assertEqual(wdmtoolbox.WDM.list_dsns(self.wdmname),
+                             [101, 105])
+            wdmtoolbox.deletedsn(self.wdmname, 105)
+            wdmtoolbox.csvtowdm_multi(self.wdmname, '101,102,103',
+                                      input_ts=csvname,
+                                      create=True)
+        finally:
+            os.remove(csvname)
+        self.assertEqual(wdmtoolbox.WDM.list_dsns(self.wdmname),
+                         [101, 102, 103])
+        ret1 = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+        for dsn, scale in [[102, 2], [103, 3]]:
+            self.assertEqual(
+                wdmtoolbox.WDM.describe_dsn(self.wdmname, dsn)['tstep'], 15)
+            ret2 = wdmtoolbox.WDM.read_dsn(self.wdmname, dsn)
+            ret2.columns = ret1.columns
+            assert_frame_equal(ret2, ret1 * scale)
+
+    def test_read_dsn_array(self):
+        import pandas as pd
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        full = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+        values, start, freq = wdmtoolbox.WDM.read_dsn_array(self.wdmname,
+                                                            101)
+        self.assertEqual(values.dtype, pd.np.float32)
+        self.assertEqual(start, full.index[0])
+        index = pd.date_range(start, periods=len(values), freq=freq)
+        self.assertTrue((index == full.index).all())
+        self.assertTrue(pd.np.allclose(values, full.values[:, 0],
+                                       equal_nan=True))
+
+    def test_read_dsn_cache(self):
+        from wdmtoolbox.wdmutil import WDM
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        cwdm = WDM(cache_size=2**24)
+        full = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+
+        first = cwdm.read_dsn(self.wdmname, 101)
+        first.iloc[0, 0] = -1.0
+        assert_frame_equal(cwdm.read_dsn(self.wdmname, 101), full)
+        info = cwdm.cache_info()
+        self.assertEqual(info['hits'], 1)
+        self.assertEqual(info['misses'], 1)
+        self.assertEqual(info['entries'], 1)
+        self.assertTrue(0 < info['bytes'] <= 2**24)
+
+        # A different window is a different entry.
+        cwdm.read_dsn(self.wdmname, 101, start_date=full.index[10])
+        self.assertEqual(cwdm.cache_info()['entries'], 2)
+
+        # Writes drop the entries of the DSN.
+        data = full.iloc[:5] * 2
+        cwdm.write_dsn(self.wdmname, 101, data, overwrite=True)
+        self.assertEqual(cwdm.cache_info()['entries'], 0)
+        assert_frame_equal(cwdm.read_dsn(self.wdmname, 101).iloc[:5], data)
+
+        # Results larger than the cache are not kept.
+        cwdm.cache_size = 100
+        cwdm.cache_clear()
+        cwdm.read_dsn(self.wdmname, 101)
+        self.assertEqual(cwdm.cache_info()['entries'], 0)
+
+        cwdm.cache_size = 2**24
+        cwdm.read_dsn(self.wdmname, 101)
+        cwdm.delete_dsn(self.wdmname, 101)
+        self.assertEqual(cwdm.cache_info()['entries'], 0)
+
+        with assertRaisesRegexp(ValueError, 'does not exist'):
+            cwdm.read_dsn(self.wdmname + '.missing', 101)
+
+    def test_label_cache(self):
+        from wdmtoolbox.wdmutil import WDM
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.createnewdsn(self.wdmname, 102, tcode=2,
+                                base_year=1970, tsstep=15)
+        cwdm = WDM()
+        calls = []
+        wtfndt = cwdm.wtfndt
+
+        def counted(wdmfp, dsn, gpflg):
+            calls.append(dsn)
+            return wtfndt(wdmfp, dsn, gpflg)
+        cwdm.wtfndt = counted
+
+        data = tstoolbox.read('tests/nwisiv_02246000.csv')
+        desc = cwdm.describe_dsn(self.wdmname, 101)
+        desc['llsdat'][0] = 1
+        self.assertEqual(cwdm.describe_dsn(self.wdmname, 101)['start_date'],
+                         None)
+        self.assertEqual(calls, [101])
+
+        # The write reads the label once, and the write drops it.
+        cwdm.write_dsn(self.wdmname, 101, data)
+        self.assertEqual(calls, [101])
+        full = cwdm.read_dsn(self.wdmname, 101)
+        cwdm.read_dsn(self.wdmname, 101, start_date=full.index[10])
+        self.assertEqual(calls, [101, 101])
+        self.assertEqual(cwdm.describe_dsn(self.wdmname, 101)['start_date'],
+                         full.index[0].isoformat())
+
+        self.assertEqual(sorted(cwdm.describe_dsns(self.wdmname)),
+                         [101, 102])
+        self.assertEqual(calls, [101, 101, 102])
+        cwdm.delete_dsn(self.wdmname, 102)
+        self.assertEqual(sorted(cwdm.describe_dsns(self.wdmname)), [101])
+
+    def test_numpy_backend(self):
+        import pandas as pd
+        from wdmtoolbox.wdmutil import WDM
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15,
+                                location='BASIN1')
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        fwdm = wdmtoolbox.WDM
+        nwdm = WDM(backend='numpy')
+        self.assertEqual(nwdm.list_dsns(self.wdmname), [101])
+        desc = nwdm.describe_dsn(self.wdmname, 101)
+        for key, value in fwdm.describe_dsn(self.wdmname, 101).items():
+            if key not in ['llsdat', 'lledat']:
+                self.assertEqual(desc[key], value)
+        assert_frame_equal(nwdm.read_dsn(self.wdmname, 101),
+                           fwdm.read_dsn(self.wdmname, 101))
+        for transform in ['mean', 'sum', 'max', 'min']:
+            assert_frame_equal(nwdm.read_dsn(self.wdmname, 101, tcode=3,
+                                             transform=transform),
+                               fwdm.read_dsn(self.wdmname, 101, tcode=3,
+                                             transform=transform),
+                               check_less_precise=True)
+        with assertRaisesRegexp(WDMError, 'can only read'):
+            nwdm.delete_dsn(self.wdmname, 101)
+
+        # The date functions are ported from the WDM library.
+        for date in [[1999, 12, 31, 24, 0, 0], [2000, 2, 29, 0, 0, 0],
+                     [2000, 1, 31, 23, 45, 0], [1900, 2, 28, 12, 0, 30]]:
+            for tcode, tstep in [[1, 30], [2, 15], [3, 1], [4, 1], [5, 1],
+                                 [6, 1]]:
+                later = fwdm.timadd(date, tcode, tstep, 1000)
+                self.assertEqual(list(nwdm.timadd(date, tcode, tstep, 1000)),
+                                 list(later))
+                self.assertEqual(nwdm.timdif(date, later, tcode, tstep),
+                                 fwdm.timdif(date, later, tcode, tstep))
+            converted = pd.np.array(date, dtype='i4')
+            fwdm.timcvt(converted)
+            date = pd.np.array(date, dtype='i4')
+            nwdm.timcvt(date)
+            self.assertEqual(list(date), list(converted))
+
+    def test_numpy_backend_read_only(self):
+        import shutil
+        from wdmtoolbox.wdmutil import WDM
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        fd, wdmname2 = tempfile.mkstemp(suffix='.wdm')
+        os.close(fd)
+        shutil.copy(self.wdmname, wdmname2)
+        nwdm = WDM(backend='numpy')
+        nwdm.keep_open = True
+        try:
+            full = nwdm.read_dsn(wdmname2, 101)
+            with assertRaisesRegexp(WDMError, 'can only read'):
+                nwdm.delete_dsn(self.wdmname, 101)
+            # Only the file of the refused call is closed.
+            self.assertEqual(sorted(nwdm.openfiles),
+                             [os.path.abspath(wdmname2)])
+            self.assertTrue(nwdm.openfiles[os.path.abspath(
+                wdmname2)].words is not None)
+            assert_frame_equal(nwdm.read_dsn(wdmname2, 101), full)
+        finally:
+            nwdm.close_files()
+            os.remove(wdmname2)
+
+    def test_numpy_backend_without_library(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        full = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+        out = subprocess.check_output([sys.executable, '-c', '''
+import sys
+sys.modules['_wdm_lib'] = None
+from wdmtoolbox.wdmutil import WDM
+print(WDM(backend='numpy').read_dsn({0!r}, 101).iloc[:, 0].sum())
+'''.format(self.wdmname)])
+        self.assertEqual(float(out.decode().split()[-1]),
+                         full.iloc[:, 0].sum())
+
+    def test_numpy_backend_threads(self):
+        import shutil
+        from wdmtoolbox.wdmutil import WDM
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        fd, wdmname2 = tempfile.mkstemp(suffix='.wdm')
+        os.close(fd)
+        shutil.copy(self.wdmname, wdmname2)
+        full = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+
+        # Hold a read of the first file inside wdtget while the second
+        # file is read from another thread.
+        nwdm = WDM(backend='numpy')
+        release = threading.Event()
+        wdtget = nwdm.wdtget
+
+        def blocking(wdmfp, *args):
+            if wdmfp.wdmpath == os.path.abspath(self.wdmname):
+                release.wait(10)
+            return wdtget(wdmfp, *args)
+        nwdm.wdtget = blocking
+
+        results = {}
+        first = threading.Thread(target=lambda: results.setdefault(
+            1, nwdm.read_dsn(self.wdmname, 101)))
+        second = threading.Thread(target=lambda: results.setdefault(
+            2, nwdm.read_dsn(wdmname2, 101)))
+        try:
+            first.start()
+            second.start()
+            second.join(5)
+            self.assertEqual(sorted(results), [2])
+        finally:
+            release.set()
+            first.join()
+            second.join()
+            os.remove(wdmname2)
+        self.assertEqual(results[2].values.tolist(), full.values.tolist())
+        self.assertEqual(results[1].values.tolist(), full.values.tolist())
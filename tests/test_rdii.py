@@ -16,6 +16,7 @@ try:
 except:
     from io import StringIO
 
+import pandas as pd
 from pandas.util.testing import TestCase
 
 from wdmtoolbox import wdmtoolbox
@@ -49,4 +50,61 @@ class TestDescribe(TestCase):
         wdmtoolbox.copydsn(self.wdmname, 101, self.wdmname, 1101)
         wdmtoolbox.wdmtoswmm5rdii(self.wdmname, 101, 1101)
 
+    def test_rdii_lines(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        wdmtoolbox.copydsn(self.wdmname, 101, self.wdmname, 1101)
+        stdout = sys.stdout
+        try:
+            out = capture(wdmtoolbox.wdmtoswmm5rdii, self.wdmname, 101, 1101)
+        finally:
+            sys.stdout = stdout
+        lines = out.decode('utf-8').splitlines()
+        self.assertEqual(lines[:8], ['SWMM5',
+                                     'RDII dump of DSNS (101, 1101) from '
+                                     '{0}'.format(self.wdmname),
+                                     '900',
+                                     '1',
+                                     'FLOW CFS',
+                                     '2',
+                                     '101_',
+                                     '1101_'])
+        self.assertEqual(lines[8], 'Node Year Mon Day Hr Min Sec Flow')
+        self.assertEqual(lines[9:13], ['101_ 2014 02 21 00 00 00 66',
+                                       '1101_ 2014 02 21 00 00 00 66',
+                                       '101_ 2014 02 21 00 15 00 62',
+                                       '1101_ 2014 02 21 00 15 00 62'])
+        self.assertEqual(len(lines), 9 + 2 * 193)
+        values = wdmtoolbox.WDM.read_dsn(self.wdmname, 101)
+        expected = []
+        for date, value in zip(values.index, values.iloc[:, 0]):
+            for node in ['101_', '1101_']:
+                expected.append('{0} {1} {2}'.format(
+                    node, date.strftime('%Y %m %d %H %M %S'),
+                    '%.9g' % value))
+        self.assertEqual(lines[9:], expected)
+
 
+
+    def test_rdii_precision(self):
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+        data = wdmtoolbox.WDM.read_dsn(self.wdmname, 101) * 1000 + 1 / 7.0
+        wdmtoolbox.WDM.write_dsn(self.wdmname, 101, data)
+        values = wdmtoolbox.WDM.read_dsn(self.wdmname, 101).iloc[:, 0]
+        stdout = sys.stdout
+        try:
+            out = capture(wdmtoolbox.wdmtoswmm5rdii, self.wdmname, 101)
+        finally:
+            sys.stdout = stdout
+        lines = out.decode('utf-8').splitlines()
+        self.assertEqual(lines[8], '101_ 2014 02 21 00 00 00 66000.1406')
+        # Nine significant digits are enough to get back every float32.
+        self.assertEqual([pd.np.float32(i.split()[-1]) for i in lines[8:]],
+                         list(values.astype('float32')))
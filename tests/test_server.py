@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_server
+----------------------------------
+
+Tests for `wdmtoolbox` module.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from pandas.util.testing import TestCase
+
+from wdmtoolbox import server
+from wdmtoolbox import wdmtoolbox
+
+CLI = 'from wdmtoolbox import wdmtoolbox; wdmtoolbox.main()'
+
+
+class TestDescribe(TestCase):
+    def setUp(self):
+        self.fd, self.wdmname = tempfile.mkstemp(suffix='.wdm')
+        os.close(self.fd)
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.csvtowdm(self.wdmname, 101,
+                            input_ts='tests/nwisiv_02246000.csv')
+
+        self.server_file = self.wdmname + '.server'
+        self.environ = os.environ.get('WDMTOOLBOX_SERVER')
+        os.environ['WDMTOOLBOX_SERVER'] = self.server_file
+        self.proc = subprocess.Popen([sys.executable, '-c', CLI, 'serve'])
+        for _ in range(300):
+            if os.path.exists(self.server_file):
+                break
+            time.sleep(0.1)
+
+    def tearDown(self):
+        try:
+            server.stop()
+        except server.ServerNotRunning:
+            pass
+        self.proc.wait()
+        if self.environ is None:
+            os.environ.pop('WDMTOOLBOX_SERVER')
+        else:
+            os.environ['WDMTOOLBOX_SERVER'] = self.environ
+        os.remove(self.wdmname)
+
+    def local(self, *args):
+        env = dict(os.environ)
+        env['WDMTOOLBOX_SERVER'] = ''
+        return subprocess.check_output([sys.executable, '-c', CLI] +
+                                       list(args), env=env).decode()
+
+    def test_forward(self):
+        for argv in [['describedsn', self.wdmname, '101'],
+                     ['listdsns', self.wdmname],
+                     ['extract', self.wdmname, '101']]:
+            out, _, code = server.forward(argv)
+            self.assertEqual(code, 0)
+            self.assertEqual(out, self.local(*argv))
+
+        _, err, code = server.forward(['describedsn', self.wdmname, '102'])
+        self.assertEqual(code, 1)
+        self.assertTrue('data set does not exist' in err)
+        self.assertEqual(server.forward(['deletedsn', self.wdmname, '101']),
+                         None)
+        # Chunked output is printed by the client as it is read.
+        for argv in [['extract', '--chunksize', 'D', self.wdmname, '101'],
+                     ['extract', self.wdmname, '101', '--chunk=D']]:
+            self.assertEqual(server.forward(argv), None)
+        self.assertEqual(server.status()['requests'], 4)
+
+    def test_forward_only(self):
+        with self.assertRaisesRegexp(ValueError, 'deletedsn'):
+            server.request({'cwd': os.getcwd(),
+                            'argv': ['deletedsn', self.wdmname, '101']})
+        with self.assertRaises(ValueError):
+            server.request({'cwd': os.getcwd(), 'argv': []})
+        out, _, code = server.forward(['describedsn', self.wdmname, '101'])
+        self.assertEqual(code, 0)
+
+    def test_many_files(self):
+        # More files than the WDM library can hold open at once.
+        files = []
+        try:
+            for num in range(7):
+                files.append('{0}.{1}.wdm'.format(self.wdmname, num))
+                shutil.copy(self.wdmname, files[-1])
+            argv = ['extract'] + ['{0},101'.format(i) for i in files]
+            for _ in range(2):
+                out, _, code = server.forward(argv)
+                self.assertEqual(code, 0)
+                self.assertEqual(out, self.local(*argv))
+        finally:
+            for i in files:
+                os.remove(i)
+
+    def test_call(self):
+        local = wdmtoolbox.WDM.read_dsn_array(self.wdmname, 101)
+        values, start, freq = server.call('read_dsn_array', self.wdmname,
+                                          101)
+        self.assertTrue((values == local[0]).all())
+        self.assertEqual([start, freq], list(local[1:]))
+        self.assertTrue(os.path.abspath(self.wdmname) in
+                        server.status()['openfiles'])
+
+        # A change by another process is seen by the next request.
+        wdmtoolbox.WDM.write_dsn(self.wdmname, 101,
+                                 wdmtoolbox.WDM.read_dsn(self.wdmname,
+                                                         101) * 2)
+        values, _, _ = server.call('read_dsn_array', self.wdmname, 101)
+        self.assertTrue((values == local[0] * 2).all())
+
+        with self.assertRaises(ValueError):
+            server.call('delete_dsn', self.wdmname, 101)
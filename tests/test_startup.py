@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_startup
+----------------------------------
+
+Tests for `wdmtoolbox` module.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from pandas.util.testing import TestCase
+
+from wdmtoolbox import wdmtoolbox
+
+# Run in a new interpreter.  Prints the modules that the import of
+# wdmtoolbox and the command added to sys.modules.
+CHILD = """
+import json
+import sys
+before = set(sys.modules)
+from wdmtoolbox import wdmtoolbox
+sys.argv = ['wdmtoolbox'] + {0!r}
+wdmtoolbox.main()
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+HEAVY = ['pandas', 'tstoolbox', 'dateutil']
+
+
+class TestDescribe(TestCase):
+    def setUp(self):
+        self.fd, self.wdmname = tempfile.mkstemp(suffix='.wdm')
+        os.close(self.fd)
+        wdmtoolbox.createnewwdm(self.wdmname, overwrite=True)
+        wdmtoolbox.createnewdsn(self.wdmname, 101, tcode=2,
+                                base_year=1970, tsstep=15)
+        wdmtoolbox.createnewdsn(self.wdmname, 102, tcode=2,
+                                base_year=1970, tsstep=15)
+
+    def tearDown(self):
+        os.remove(self.wdmname)
+
+    def imported(self, *args):
+        out = subprocess.check_output([sys.executable, '-c',
+                                       CHILD.format(list(args))])
+        return [i.split('.')[0]
+                for i in json.loads(out.decode().splitlines()[-1])]
+
+    def test_describedsn_startup(self):
+        imported = self.imported('describedsn', self.wdmname, '101')
+        self.assertEqual([i for i in HEAVY if i in imported], [])
+
+    def test_deletedsn_startup(self):
+        imported = self.imported('deletedsn', self.wdmname, '102')
+        self.assertEqual([i for i in HEAVY if i in imported], [])
+        self.assertEqual(wdmtoolbox.WDM.list_dsns(self.wdmname), [101])
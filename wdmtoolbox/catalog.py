@@ -0,0 +1,152 @@
+"""A SQLite catalog of the DSN metadata in a WDM file.
+
+The catalog is kept next to the WDM file, as 'file.wdm.catalog', and holds
+the describe_dsn fields of every time-series DSN.  It records the
+modification time and size of the WDM file it was built from, and is
+rebuilt, with one pass over the labels, whenever either of them changes.
+If the catalog cannot be written, the WDM file is described directly.
+"""
+
+import json
+import os
+import sqlite3
+
+# The describe_dsn fields kept in the catalog, with their SQLite types.
+# 'llsdat' and 'lledat' are stored as JSON lists.
+FIELDS = [
+    ('dsn', 'INTEGER PRIMARY KEY'),
+    ('start_date', 'TEXT'),
+    ('end_date', 'TEXT'),
+    ('llsdat', 'TEXT'),
+    ('lledat', 'TEXT'),
+    ('tstep', 'INTEGER'),
+    ('tcode', 'INTEGER'),
+    ('tcode_name', 'TEXT'),
+    ('location', 'TEXT'),
+    ('scenario', 'TEXT'),
+    ('constituent', 'TEXT'),
+    ('tsfill', 'REAL'),
+    ('description', 'TEXT'),
+    ('base_year', 'INTEGER'),
+    ]
+
+NAMES = [i[0] for i in FIELDS]
+
+
+def catalog_path(wdmpath):
+    """Return the path of the catalog for wdmpath."""
+    return wdmpath.strip() + '.catalog'
+
+
+def _stamp(wdmpath):
+    """Return the modification time and size of the WDM file."""
+    stat = os.stat(wdmpath.strip())
+    return repr(stat.st_mtime), stat.st_size
+
+
+def _to_row(desc):
+    """Convert a describe_dsn dictionary to a catalog row."""
+    row = []
+    for name in NAMES:
+        value = desc[name]
+        if name in ['llsdat', 'lledat']:
+            value = json.dumps([int(i) for i in value])
+        elif name in ['dsn', 'tstep', 'tcode', 'base_year']:
+            value = int(value)
+        elif name == 'tsfill':
+            value = float(value)
+        row.append(value)
+    return row
+
+
+def _from_row(row):
+    """Convert a catalog row to a describe_dsn dictionary."""
+    desc = dict(zip(NAMES, row))
+    desc['llsdat'] = json.loads(desc['llsdat'])
+    desc['lledat'] = json.loads(desc['lledat'])
+    return desc
+
+
+def _connect(wdm, wdmpath):
+    """Return a connection to an up to date catalog, or None.
+
+    None is returned if the catalog cannot be read or written, for example
+    in a read-only directory.
+    """
+    path = catalog_path(wdmpath)
+    stamp = _stamp(wdmpath)
+    for attempt in [0, 1]:
+        conn = None
+        try:
+            conn = sqlite3.connect(path)
+            try:
+                found = conn.execute(
+                    'SELECT mtime, size FROM stamp').fetchone()
+            except sqlite3.OperationalError:
+                # A new catalog without any tables.
+                found = None
+            if found != stamp:
+                _rebuild(conn, wdm, wdmpath, stamp)
+            return conn
+        except sqlite3.DatabaseError:
+            if conn is not None:
+                conn.close()
+            if attempt == 1 or not os.path.exists(path):
+                return None
+            # Not a catalog, or a damaged one.  Start again.
+            try:
+                os.remove(path)
+            except OSError:
+                return None
+
+
+def _rebuild(conn, wdm, wdmpath, stamp):
+    """Describe every DSN of wdmpath into the catalog."""
+    rows = [_to_row(desc) for desc in wdm.describe_dsns(wdmpath).values()]
+    with conn:
+        conn.execute('DROP TABLE IF EXISTS stamp')
+        conn.execute('DROP TABLE IF EXISTS dsns')
+        conn.execute('CREATE TABLE stamp (mtime TEXT, size INTEGER)')
+        conn.execute('CREATE TABLE dsns ({0})'.format(
+            ', '.join('{0} {1}'.format(*i) for i in FIELDS)))
+        conn.execute('INSERT INTO stamp VALUES (?, ?)', stamp)
+        conn.executemany('INSERT INTO dsns VALUES ({0})'.format(
+            ', '.join('?' * len(NAMES))), rows)
+
+
+def describe_dsns(wdm, wdmpath):
+    """Return the describe_dsn dictionary of every DSN, keyed by DSN.
+
+    Answers from the catalog, rebuilding it first if the WDM file changed.
+    """
+    return find_dsns(wdm, wdmpath)
+
+
+def find_dsns(wdm, wdmpath, scenario=None, location=None, constituent=None):
+    """Return the describe_dsn dictionary of the matching DSNs, keyed by DSN.
+
+    The `scenario`, `location`, and `constituent` are matched without
+    regard to case.  Those that are None match every DSN.
+    """
+    match = [[name, value] for name, value in [['scenario', scenario],
+                                               ['location', location],
+                                               ['constituent', constituent]]
+             if value is not None]
+
+    conn = _connect(wdm, wdmpath)
+    if conn is None:
+        descs = wdm.describe_dsns(wdmpath)
+        return dict((dsn, desc) for dsn, desc in descs.items()
+                    if all(desc[name].upper() == value.strip().upper()
+                           for name, value in match))
+
+    query = 'SELECT {0} FROM dsns'.format(', '.join(NAMES))
+    if match:
+        query = query + ' WHERE ' + ' AND '.join(
+            'UPPER({0}) = ?'.format(name) for name, _ in match)
+    try:
+        rows = conn.execute(query,
+                            [value.strip().upper() for _, value in match])
+        return dict((row[0], _from_row(row)) for row in rows)
+    finally:
+        conn.close()
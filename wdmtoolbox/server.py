@@ -0,0 +1,312 @@
+"""Serve wdmtoolbox reads from a long running process.
+
+'wdmtoolbox serve' loads the WDM library once and keeps the WDM files open
+between requests.  While it runs, the extract, describedsn, and listdsns
+commands are forwarded to it by the wdmtoolbox command, which then only
+prints what the server sends back and so never imports PANDAS or loads
+the WDM library itself.  The server sends back all of the output at once,
+so 'extract --chunksize', which prints each chunk as it is read, is not
+forwarded.  From Python, `call` runs a WDM method in the
+server and returns its result, for example the arrays of read_dsn_array.
+
+The server listens with multiprocessing.connection, on a Unix domain
+socket where there are Unix domain sockets and on localhost otherwise.
+It writes its address and a random key to the server file, which only
+the user can read, and a client needs the key to connect.  The server
+file is named by the WDMTOOLBOX_SERVER environment variable, by default
+'.wdmtoolbox_server' in the home directory.  Set WDMTOOLBOX_SERVER to an
+empty string to not use a running server.
+
+Requests are handled one at a time.  Before each request the files that
+were changed since the server opened them are closed, so the request
+reads them again.
+"""
+from __future__ import print_function
+
+import binascii
+import json
+import os
+import sys
+
+# The commands that the wdmtoolbox command sends to a running server.
+FORWARD = ['extract', 'describedsn', 'listdsns']
+
+# The options that make a command print as it goes, so that it is not
+# forwarded when they are given.
+STREAMED = {'extract': '--chunksize'}
+
+# The WDM methods that can be run in the server with `call`.
+METHODS = ['describe_dsn', 'describe_dsns', 'dsn_name', 'list_dsns',
+           'read_dsn', 'read_dsn_array']
+
+
+class ServerNotRunning(Exception):
+    """No wdmtoolbox server answers at the address in the server file."""
+
+    def __init__(self, path):
+        """Initialize with the server file."""
+        self.path = path
+
+    def __str__(self):
+        """Return detailed error message."""
+        return """
+*
+*   No wdmtoolbox server is running for the server file
+*   {0}
+*
+""".format(self.path)
+
+
+def server_file():
+    """Return the server file, or None if running servers are not used."""
+    path = os.environ.get('WDMTOOLBOX_SERVER')
+    if path is None:
+        path = os.path.join(os.path.expanduser('~'), '.wdmtoolbox_server')
+    return path or None
+
+
+def _address(info):
+    """Return the multiprocessing.connection address in the server file."""
+    if info['family'] == 'AF_INET':
+        return tuple(info['address'])
+    return info['address']
+
+
+def request(req, path=None):
+    """Send the request dictionary to the server and return the reply.
+
+    Raises ServerNotRunning if there is no server file, or no server
+    answers at its address.
+    """
+    path = path or server_file()
+    try:
+        with open(path) as fpi:
+            info = json.load(fpi)
+    except (IOError, OSError, ValueError, TypeError):
+        raise ServerNotRunning(path)
+
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Client
+
+    try:
+        conn = Client(_address(info),
+                      family=info['family'],
+                      authkey=binascii.unhexlify(info['authkey']))
+    except (IOError, OSError, KeyError, TypeError, ValueError, EOFError,
+            AuthenticationError):
+        raise ServerNotRunning(path)
+    try:
+        conn.send(req)
+        status, value = conn.recv()
+    except (IOError, OSError, EOFError):
+        raise ServerNotRunning(path)
+    finally:
+        conn.close()
+    if status == 'error':
+        raise value
+    return value
+
+
+def forward(argv):
+    """Run a wdmtoolbox command in the server.
+
+    Returns [stdout, stderr, exit code] of the command, or None if the
+    command is not one that is forwarded or no server is running.
+    """
+    if not argv or argv[0] not in FORWARD or server_file() is None:
+        return None
+    option = STREAMED.get(argv[0])
+    for arg in argv[1:]:
+        # Also catch '--option=value' and the abbreviations of argparse.
+        name = arg.split('=')[0]
+        if option and len(name) > 2 and option.startswith(name):
+            return None
+    try:
+        return request({'cwd': os.getcwd(), 'argv': list(argv)})
+    except ServerNotRunning:
+        return None
+
+
+def call(method, *args, **kwds):
+    """Run the WDM method in the server and return the result.
+
+    The `method` is one of METHODS.  Relative paths are taken from the
+    current directory of the caller.
+    """
+    return request({'cwd': os.getcwd(),
+                    'method': method,
+                    'args': args,
+                    'kwds': kwds})
+
+
+def status(path=None):
+    """Return a dictionary that describes the running server."""
+    return request({'command': 'status'}, path=path)
+
+
+def stop(path=None):
+    """Stop the running server."""
+    return request({'command': 'stop'}, path=path)
+
+
+def _run(argv):
+    """Run a wdmtoolbox command, returning [stdout, stderr, exit code]."""
+    import traceback
+
+    import mando
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+
+    out = StringIO()
+    err = StringIO()
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = out, err
+    code = 0
+    try:
+        mando.main.execute(argv)
+    except SystemExit as exc:
+        code = exc.code
+        if code is None:
+            code = 0
+        elif not isinstance(code, int):
+            err.write('{0}\n'.format(code))
+            code = 1
+    except Exception as exc:
+        err.write(''.join(traceback.format_exception_only(type(exc), exc)))
+        code = 1
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+    return [out.getvalue(), err.getvalue(), code]
+
+
+def _handle(wdm, req, counts):
+    """Return the reply to one request."""
+    import pickle
+
+    if req.get('command') == 'status':
+        return ['ok', {'pid': os.getpid(),
+                       'requests': counts['requests'],
+                       'openfiles': sorted(wdm.openfiles),
+                       'cache': wdm.cache_info()}]
+
+    counts['requests'] = counts['requests'] + 1
+    wdm.close_files(changed_only=True)
+
+    cwd = os.getcwd()
+    try:
+        os.chdir(req['cwd'])
+        if 'argv' in req:
+            if not req['argv'] or req['argv'][0] not in FORWARD:
+                raise ValueError("""
+*
+*   The server can only run the wdmtoolbox commands {0}, not '{1}'.
+*
+""".format(FORWARD, ' '.join(req['argv'])))
+            return ['ok', _run(req['argv'])]
+        if req.get('method') not in METHODS:
+            raise ValueError("""
+*
+*   The server can only run the WDM methods {0}, not '{1}'.
+*
+""".format(METHODS, req.get('method')))
+        return ['ok', getattr(wdm, req['method'])(*req['args'],
+                                                  **req['kwds'])]
+    except Exception as exc:
+        try:
+            pickle.loads(pickle.dumps(exc))
+        except Exception:
+            # Some exceptions cannot be sent back as they are.
+            exc = ValueError(str(exc))
+        return ['error', exc]
+    finally:
+        os.chdir(cwd)
+
+
+def serve(wdm, path=None, cache_size=0):
+    """Answer requests with wdm until a stop request or KeyboardInterrupt.
+
+    The `wdm` is the WDM instance that the wdmtoolbox commands use.
+    """
+    import socket
+    import tempfile
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Listener
+
+    path = path or server_file()
+    if path is None:
+        raise ValueError("""
+*
+*   The WDMTOOLBOX_SERVER environment variable is empty, so there is no
+*   server file to tell the clients where the server is.
+*
+""")
+    try:
+        status(path)
+    except ServerNotRunning:
+        pass
+    else:
+        raise ValueError("""
+*
+*   A wdmtoolbox server is already running for the server file
+*   {0}
+*
+""".format(path))
+
+    authkey = os.urandom(32)
+    tempdir = None
+    if hasattr(socket, 'AF_UNIX'):
+        family = 'AF_UNIX'
+        # Only the user can reach the socket in the new directory.
+        tempdir = tempfile.mkdtemp(prefix='wdmtoolbox-')
+        listener = Listener(os.path.join(tempdir, 'socket'),
+                            family=family,
+                            authkey=authkey)
+    else:
+        family = 'AF_INET'
+        listener = Listener(('localhost', 0), family=family, authkey=authkey)
+
+    wdm.keep_open = True
+    wdm.cache_size = int(cache_size)
+    counts = {'requests': 0}
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+        fpo = os.fdopen(os.open(path,
+                                os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                                0o600), 'w')
+        with fpo:
+            json.dump({'pid': os.getpid(),
+                       'family': family,
+                       'address': listener.address,
+                       'authkey': binascii.hexlify(authkey).decode()}, fpo)
+
+        while True:
+            try:
+                conn = listener.accept()
+            except (IOError, OSError, EOFError, AuthenticationError):
+                continue
+            try:
+                req = conn.recv()
+                if req.get('command') == 'stop':
+                    conn.send(['ok', None])
+                    break
+                conn.send(_handle(wdm, req, counts))
+            except (IOError, OSError, EOFError):
+                pass
+            finally:
+                conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        wdm.close_files()
+        wdm.keep_open = False
+        if os.path.exists(path):
+            os.remove(path)
+        if tempdir is not None:
+            try:
+                os.rmdir(tempdir)
+            except OSError:
+                pass
@@ -0,0 +1,665 @@
+"""Read WDM files with NumPy instead of the Fortran WDM library.
+
+The WDM file is memory mapped as an array of 512 word records and the
+directory, data-set labels, and time-series groups are decoded directly.
+There is no Fortran unit number, record buffer, or limit on the number of
+open files.  The functions have the same names, arguments, and return values
+as the _wdm_lib functions they replace, except that the first argument is the
+WDMFile returned by wdbopn instead of a Fortran unit number.  The date
+functions timcvt, timdif, and timadd are ported from UTDATE.f, so the
+compiled WDM library is not needed at all.
+
+Only reading is supported.
+"""
+
+import datetime
+
+import numpy as np
+
+# Seconds in the fixed length WDM time units, keyed by TCODE
+SECONDS = {
+    1: 1,
+    2: 60,
+    3: 3600,
+    4: 86400,
+    }
+
+# Months in the calendar WDM time units, keyed by TCODE
+MONTHS = {
+    5: 1,
+    6: 12,
+    7: 1200,
+    }
+
+# Positions of the directory record pointers on the file definition record
+PDIRPT = 113
+
+# Quality code of blocks that hold no data
+MISSING_QUALITY = 31
+
+
+class WDMFile(object):
+    """A WDM file mapped into memory as 512 word records."""
+
+    def __init__(self, wdmpath):
+        """Map the file read-only."""
+        words = np.memmap(wdmpath, dtype='<i4', mode='r')
+        nrec = len(words) // 512
+        self.wdmpath = wdmpath
+        # A plain ndarray view of the map is quicker to index.
+        self.words = words[:nrec * 512].reshape(nrec, 512).view(np.ndarray)
+        self.reals = self.words.view('<f4')
+
+    def close(self):
+        """Drop the memory map."""
+        self.words = None
+        self.reals = None
+
+    def word(self, rec, pos):
+        """Return the integer at the 1-based record and position."""
+        return int(self.words[rec - 1, pos - 1])
+
+    def label_record(self, dsn):
+        """Return the record of the DSN label and WDDSCK return code."""
+        if dsn < 1 or dsn > 32000:
+            return 0, -84
+        dirrec = self.word(1, min(PDIRPT + (dsn - 1) // 500, 512))
+        if dirrec == 0:
+            return 0, -81
+        pos = dsn % 500 + 4
+        if pos == 4:
+            pos = 504
+        drec = self.word(dirrec, pos)
+        if drec == 0:
+            return 0, -81
+        return drec, 0
+
+    def dsns(self):
+        """Return a sorted array of all of the DSNs in the file."""
+        found = []
+        for index, dirrec in enumerate(self.words[0, PDIRPT - 1:PDIRPT + 63]):
+            if dirrec == 0:
+                continue
+            # Positions 5 to 504 of a directory record hold the label
+            # records of the next 500 DSNs.
+            exists = np.nonzero(self.words[dirrec - 1, 4:504])[0]
+            found.append(index * 500 + exists + 1)
+        if not found:
+            return np.array([], dtype='i4')
+        return np.concatenate(found)
+
+    def attribute_position(self, drec, saind):
+        """Return the position of the attribute on the label, or 0."""
+        label = self.words[drec - 1]
+        psa = label[9]
+        samax = label[psa - 1]
+        pairs = label[psa + 1:psa + 1 + 2 * samax].reshape(-1, 2)
+        match = np.nonzero(pairs[:, 0] == saind)[0]
+        if len(match) == 0:
+            return 0
+        return int(pairs[match[0], 1])
+
+    def timeseries(self, drec):
+        """Return the parameters needed to decode the time-series groups."""
+        label = self.words[drec - 1]
+        pdat = label[10]
+        pdatv = label[11]
+        params = {'pointers': label[pdat + 1:pdatv - 1],
+                  'tsfill': 0.0,
+                  'tgroup': 6}
+        pos = self.attribute_position(drec, 32)
+        if pos:
+            params['tsfill'] = float(self.reals[drec - 1, pos - 1])
+        pos = self.attribute_position(drec, 34)
+        if pos:
+            params['tgroup'] = self.word(drec, pos)
+
+        # The base date is the start of the first group.  Work it out from
+        # the date at the start of the first group with data, so that it
+        # does not depend on the optional base date attributes.
+        used = np.nonzero(params['pointers'])[0]
+        params['used'] = used
+        if len(used):
+            rec, pos = divmod(int(params['pointers'][used[0]]), 512)
+            params['base'] = _add(_date_word(self.word(rec, pos)),
+                                  params['tgroup'],
+                                  -used[0])
+        return params
+
+    def _skip(self, rec, pos, numskp):
+        """Move numskp words ahead, following the record chain (WDSKBK)."""
+        pos = pos + numskp
+        if pos == 512:
+            pos = 513
+        while pos > 512:
+            rec = self.word(rec, 4)
+            pos = pos - 508
+        return rec, pos
+
+    def blocks(self, params, group):
+        """Yield each block of a group.
+
+        Yields the start and end of the block in seconds since 1970, its
+        time units, time step, number of values, quality code, and values.
+        Compressed blocks have a single value.
+        """
+        start = int(_add(params['base'], params['tgroup'], group).astype('i8'))
+        end = int(_add(params['base'], params['tgroup'],
+                       group + 1).astype('i8'))
+        rec, pos = divmod(int(params['pointers'][group]), 512)
+        rec, pos = self._skip(rec, pos, 1)
+        while start < end:
+            nov, tstep, tcode, compcd, qualcd = _split_bcw(
+                self.word(rec, pos))
+            if nov == 0:
+                # The rest of the group has not been written.
+                yield start, start, tcode, tstep, nov, qualcd, None
+                return
+            if compcd == 0:
+                values = self.reals[rec - 1, pos:pos + nov]
+                numskp = nov + 1
+            else:
+                values = self.reals[rec - 1, pos:pos + 1]
+                numskp = 2
+            if tcode in SECONDS:
+                bend = start + tstep * nov * SECONDS[tcode]
+            else:
+                bend = int(_add(np.datetime64(start, 's'),
+                                tcode,
+                                tstep * nov).astype('i8'))
+            yield start, bend, tcode, tstep, nov, qualcd, values
+            start = bend
+            rec, pos = self._skip(rec, pos, numskp)
+
+
+def _split_bcw(bcw):
+    """Split a block control word (WBCWSP)."""
+    bcw = bcw & 0xFFFFFFFF
+    return (bcw >> 16,
+            (bcw >> 10) & 63,
+            (bcw >> 7) & 7,
+            (bcw >> 5) & 3,
+            bcw & 31)
+
+
+def _date_word(datwrd):
+    """Convert a compressed date word to datetime64 (WDATSP)."""
+    return _datetime64([(datwrd // 16384) % 131072,
+                        (datwrd // 1024) % 16,
+                        (datwrd // 32) % 32,
+                        datwrd % 32,
+                        0,
+                        0])
+
+
+def _datetime64(date):
+    """Convert a WDM date array, which can use hour 24, to datetime64."""
+    date = [int(i) for i in date]
+    day = np.datetime64('{0:04d}-{1:02d}-{2:02d}'.format(*date[:3]), 's')
+    return day + np.timedelta64(date[3] * 3600 + date[4] * 60 + date[5], 's')
+
+
+def _wdm_date(dt64, midnight24=False):
+    """Convert datetime64 to a WDM date array.
+
+    With `midnight24` midnight is hour 24 of the previous day.
+    """
+    if midnight24 and dt64 == dt64.astype('datetime64[D]'):
+        dtime = (dt64 - np.timedelta64(1, 'D')).astype(datetime.datetime)
+        return np.array([dtime.year, dtime.month, dtime.day, 24, 0, 0],
+                        dtype='i4')
+    dtime = dt64.astype(datetime.datetime)
+    return np.array([dtime.year, dtime.month, dtime.day,
+                     dtime.hour, dtime.minute, dtime.second], dtype='i4')
+
+
+def _add(start, tcode, steps):
+    """Add steps, a number or array, of tcode time units to start."""
+    steps = np.asarray(steps, dtype='i8')
+    if tcode in SECONDS:
+        return start + (steps * SECONDS[tcode]).astype('timedelta64[s]')
+    month = start.astype('datetime64[M]')
+    offset = start - month.astype('datetime64[s]')
+    return ((month + steps * MONTHS[tcode]).astype('datetime64[s]') +
+            offset)
+
+
+def _position(dt64, calendar):
+    """Return dt64 as a count of seconds, or months if `calendar`."""
+    if calendar:
+        return dt64.astype('datetime64[M]').astype('i8')
+    return dt64.astype('i8')
+
+
+def _group_index(params, dt64):
+    """Return the index of the group that contains dt64."""
+    tgroup = params['tgroup']
+    if tgroup in SECONDS:
+        index = ((dt64 - params['base']).astype('i8') //
+                 SECONDS[tgroup])
+    else:
+        index = ((dt64.astype('datetime64[M]') -
+                  params['base'].astype('datetime64[M]')).astype('i8') //
+                 MONTHS[tgroup])
+        if _add(params['base'], tgroup, index) > dt64:
+            index = index - 1
+    return int(index)
+
+
+def _quotient(num, den):
+    """Divide integers like Fortran, truncating toward zero."""
+    quot = abs(num) // abs(den)
+    if (num < 0) != (den < 0):
+        return -quot
+    return quot
+
+
+def daymon(year, month):
+    """Return the number of days in the month (DAYMON)."""
+    if month == 2:
+        if year <= 0 or year > 9999:
+            return 28
+        if year % 100 == 0:
+            return 29 if year % 400 == 0 else 28
+        return 29 if year % 4 == 0 else 28
+    if month < 1 or month > 12:
+        return -1
+    return [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month - 1]
+
+
+def timcvt(date):
+    """Convert a date in place from hour 24 to hour 0 of the next day."""
+    if date[3] == 24:
+        date[3] = 0
+        date[2] = date[2] + 1
+        if date[2] > daymon(date[0], date[1]):
+            date[2] = 1
+            date[1] = date[1] + 1
+            if date[1] > 12:
+                date[1] = 1
+                date[0] = date[0] + 1
+
+
+def _timcnv(date):
+    """Convert a date in place from 00:00:00 to hour 24 of the day before."""
+    if date[3] == 0 and date[4] == 0 and date[5] == 0:
+        date[3] = 24
+        date[2] = date[2] - 1
+        if date[2] == 0:
+            date[1] = date[1] - 1
+            if date[1] == 0:
+                date[0] = date[0] - 1
+                date[1] = 12
+            date[2] = daymon(date[0], date[1])
+
+
+def _timchk(date1, date2):
+    """Return 1, 0, or -1 if date1 is before, the same as, or after date2."""
+    sdat = [int(i) for i in date1]
+    edat = [int(i) for i in date2]
+    _timcnv(sdat)
+    _timcnv(edat)
+    if sdat < edat:
+        return 1
+    if sdat > edat:
+        return -1
+    return 0
+
+
+def timadd(date1, tcode, tstep, nvals):
+    """Return the date nvals time steps after date1 (TIMADD)."""
+    date = [int(i) for i in date1]
+    if tcode < 4 and date[3] == 24:
+        timcvt(date)
+    tyr, tmo, tdy, thr, tmn, tsc = date
+
+    carry = nvals * tstep
+    stpos = tcode
+    if stpos == 7:
+        stpos = 6
+        carry = carry * 100
+
+    if stpos == 1:
+        tsc = tsc + carry
+        carry = _quotient(tsc, 60)
+        tsc = tsc - carry * 60
+    if stpos <= 2 and carry > 0:
+        tmn = tmn + carry
+        carry = _quotient(tmn, 60)
+        tmn = tmn - carry * 60
+    if stpos <= 3 and carry > 0:
+        thr = thr + carry
+        carry = _quotient(thr, 24)
+        thr = thr - carry * 24
+        if thr == 0 and tmn == 0 and tsc == 0:
+            # The day boundary is hour 24 of the day before.
+            thr = 24
+            carry = carry - 1
+    if stpos <= 4 and carry > 0:
+        tdy = tdy + carry
+        if tdy > 28:
+            while True:
+                dpm = daymon(tyr, tmo)
+                if tdy > dpm:
+                    tdy = tdy - dpm
+                    tmo = tmo + 1
+                    if tmo > 12:
+                        tmo = 1
+                        tyr = tyr + 1
+                elif tdy <= 0:
+                    tmo = tmo - 1
+                    if tmo == 0:
+                        tyr = tyr - 1
+                        tmo = 12
+                    tdy = tdy - daymon(tyr, tmo)
+                else:
+                    break
+
+    if stpos >= 5:
+        if stpos == 5:
+            tmo = tmo + carry
+            carry = _quotient(tmo - 1, 12)
+            tmo = tmo - carry * 12
+        if stpos <= 6 and carry > 0:
+            tyr = tyr + carry
+        dpm = daymon(tyr, tmo)
+        if dpm < tdy:
+            tdy = dpm
+        # The last day of a month stays on the last day.
+        if daymon(int(date1[0]), int(date1[1])) == int(date1[2]):
+            tdy = dpm
+
+    return np.array([tyr, tmo, tdy, thr, tmn, tsc], dtype='i4')
+
+
+def timdif(date1, date2, tcode, tstep):
+    """Return the number of whole time steps from date1 to date2 (TIMDIF)."""
+    if _timchk(date1, date2) != 1:
+        return 0
+    tmpstr = [int(i) for i in date1]
+    tmpend = [int(i) for i in date2]
+    _timcnv(tmpstr)
+    _timcnv(tmpend)
+
+    if tcode <= 4:
+        ndays = -tmpstr[2]
+        while (tmpstr[0] < tmpend[0] or
+               (tmpstr[0] == tmpend[0] and tmpstr[1] < tmpend[1])):
+            ndays = ndays + daymon(tmpstr[0], tmpstr[1])
+            tmpstr[1] = tmpstr[1] + 1
+            if tmpstr[1] == 13:
+                tmpstr[1] = 1
+                tmpstr[0] = tmpstr[0] + 1
+        ndays = ndays + tmpend[2]
+        hours = ndays * 24 + tmpend[3] - tmpstr[3]
+        minutes = hours * 60 + tmpend[4] - tmpstr[4]
+        units = {1: minutes * 60 + tmpend[5] - tmpstr[5],
+                 2: minutes,
+                 3: hours,
+                 4: ndays}[tcode]
+        nvals = _quotient(units, tstep)
+    elif tcode == 5:
+        nvals = _quotient((tmpend[0] - tmpstr[0]) * 12 +
+                          tmpend[1] - tmpstr[1], tstep)
+    elif tcode == 6:
+        nvals = _quotient(tmpend[0] - tmpstr[0], tstep)
+    else:
+        nvals = _quotient(tmpend[0] - tmpstr[0], tstep * 100)
+
+    # The estimate can be one step too many.
+    while (_timchk(date2, timadd(date1, tcode, tstep, nvals)) == 1 and
+           nvals >= 1):
+        nvals = nvals - 1
+    return nvals
+
+
+def _timeseries(wdmfp, dsn):
+    """Return the label record, time-series parameters, and return code."""
+    drec, retcode = wdmfp.label_record(dsn)
+    if retcode == 0 and wdmfp.word(drec, 6) != 1:
+        retcode = -82
+    if retcode != 0:
+        return drec, None, retcode
+    return drec, wdmfp.timeseries(drec), 0
+
+
+def wdbopn(wdname, ronwfg):
+    """Open a WDM file, returned as the WDMFile used by the other calls."""
+    return WDMFile(wdname)
+
+
+def wdflcl(wdmfp):
+    """Close a WDM file."""
+    wdmfp.close()
+    return 0
+
+
+def wdckdt(wdmfp, dsn):
+    """Return the type of the DSN or 0 if it does not exist."""
+    drec, retcode = wdmfp.label_record(dsn)
+    if retcode != 0:
+        return 0
+    return wdmfp.word(drec, 6)
+
+
+def wddsnx(wdmfp, dsn):
+    """Return the first existing DSN >= dsn, or -1 if there are none."""
+    if dsn < 1 or dsn > 32000:
+        return -1
+    dsns = wdmfp.dsns()
+    dsns = dsns[dsns >= dsn]
+    if len(dsns) == 0:
+        return -1
+    return int(dsns[0])
+
+
+def _attribute(wdmfp, dsn, saind):
+    """Return the label record, attribute position, and return code."""
+    drec, retcode = wdmfp.label_record(dsn)
+    if retcode != 0:
+        return drec, 0, retcode
+    pos = wdmfp.attribute_position(drec, saind)
+    if pos == 0:
+        return drec, 0, -107
+    return drec, pos, 0
+
+
+def wdbsgi(wdmfp, dsn, saind, salen):
+    """Return the values of an integer attribute and the return code."""
+    drec, pos, retcode = _attribute(wdmfp, dsn, saind)
+    if retcode != 0:
+        return np.repeat(np.int32(-999), salen), retcode
+    return np.array(wdmfp.words[drec - 1, pos - 1:pos - 1 + salen]), 0
+
+
+def wdbsgr(wdmfp, dsn, saind, salen):
+    """Return the values of a real attribute and the return code."""
+    drec, pos, retcode = _attribute(wdmfp, dsn, saind)
+    if retcode != 0:
+        return np.repeat(np.float32(-999.0), salen), retcode
+    return np.array(wdmfp.reals[drec - 1, pos - 1:pos - 1 + salen]), 0
+
+
+def wdbsgc(wdmfp, dsn, saind, salen):
+    """Return the value of a character attribute and the return code."""
+    drec, pos, retcode = _attribute(wdmfp, dsn, saind)
+    if retcode != 0:
+        return b' ' * salen, retcode
+    nwords = (salen + 3) // 4
+    return (wdmfp.words[drec - 1, pos - 1:pos - 1 + nwords].tobytes()[:salen],
+            0)
+
+
+def wtfndt(wdmfp, dsn, gpflg):
+    """Return the label record, start and end dates, and return code.
+
+    The end date uses hour 24 for midnight like the WDM library.
+    """
+    zeros = np.zeros(6, dtype='i4')
+    drec, params, retcode = _timeseries(wdmfp, dsn)
+    if retcode != 0:
+        return drec, zeros, zeros, retcode
+    used = params['used']
+    if len(used) == 0:
+        return drec, zeros, zeros, -6
+
+    # Start of the first block that is not missing
+    sdat = None
+    for group in used:
+        for start, _, _, _, nov, qualcd, _ in wdmfp.blocks(params, group):
+            if nov > 0 and qualcd != MISSING_QUALITY:
+                sdat = start
+                break
+        if sdat is not None:
+            break
+    if sdat is None:
+        return drec, zeros, zeros, -6
+
+    # End of the last block that is not missing in the last group, with
+    # the same rules as WTFNDT.
+    edat = None
+    msflg = 0
+    for start, end, _, _, _, qualcd, _ in wdmfp.blocks(params, used[-1]):
+        if qualcd == MISSING_QUALITY and msflg == 0:
+            edat = start
+            msflg = 1
+        else:
+            msflg = 0
+        xdat = end
+    if msflg <= 0:
+        edat = xdat
+    return (drec,
+            _wdm_date(np.datetime64(sdat, 's')),
+            _wdm_date(np.datetime64(edat, 's'), midnight24=True),
+            0)
+
+
+def wdtget(wdmfp, dsn, delt, dates, nval, dtran, qualfg, tunits):
+    """Return nval values starting at dates and the return code.
+
+    When the requested time step is different than the DSN, the values are
+    weighted by the overlap of each DSN interval with the requested
+    interval, using the DTRAN of 0 (mean), 1 (sum), 2 (max), or 3 (min).
+    Intervals with no data are set to the TSFILL attribute.
+    """
+    drec, params, retcode = _timeseries(wdmfp, dsn)
+    if retcode != 0:
+        return np.zeros(nval, dtype='f4'), retcode
+
+    start = _datetime64(dates)
+    bounds = _add(start, tunits, delt * np.arange(nval + 1))
+
+    # Collect the acceptable blocks of the groups that overlap the request.
+    blocks = []
+    if len(params['used']):
+        first = max(_group_index(params, start), 0)
+        last = _group_index(params, bounds[-1] - np.timedelta64(1, 's'))
+        for group in params['used']:
+            if group < first or group > last:
+                continue
+            for bstart, _, tcode, tstep, nov, qualcd, vals in wdmfp.blocks(
+                    params, group):
+                if nov > 0 and qualcd <= qualfg:
+                    blocks.append((bstart, tcode, tstep, nov, vals))
+
+    rval = np.full(nval, params['tsfill'], dtype='f4')
+    if not blocks:
+        return rval, 0
+
+    # Like WTGTVL, measure the intervals in the shorter of the two time
+    # units, which is months when both are months or years.
+    calendar = tunits in MONTHS and min(i[1] for i in blocks) in MONTHS
+    bounds = _position(bounds, calendar)
+
+    # Blocks at the requested time step that line up with the requested
+    # intervals only need to be copied into place.
+    step = None
+    if tunits in SECONDS:
+        step = delt * SECONDS[tunits]
+    elif calendar:
+        step = delt * MONTHS[tunits]
+    general = []
+    for block in blocks:
+        bstart, tcode, tstep, nov, vals = block
+        offset = bstart
+        if calendar:
+            offset = int(_position(np.datetime64(bstart, 's'), calendar))
+        offset = offset - int(bounds[0])
+        if step is None or (tcode, tstep) != (tunits, delt) or offset % step:
+            general.append(block)
+            continue
+        first = offset // step
+        lower = max(first, 0)
+        upper = min(first + nov, nval)
+        if lower < upper:
+            if len(vals) < nov:
+                rval[lower:upper] = vals[0]
+            else:
+                rval[lower:upper] = vals[lower - first:upper - first]
+    blocks = general
+    if not blocks:
+        return rval, 0
+
+    starts = []
+    ends = []
+    values = []
+    for tcode, tstep in set((i[1], i[2]) for i in blocks):
+        same = [i for i in blocks if i[1:3] == (tcode, tstep)]
+        novs = np.array([i[3] for i in same])
+        # Steps from the start of the block to the start of each value
+        steps = np.arange(novs.sum()) - np.repeat(np.cumsum(novs) - novs,
+                                                  novs)
+        bstarts = np.repeat(np.array([i[0] for i in same],
+                                     dtype='i8').astype('datetime64[s]'),
+                            novs)
+        starts.append(_position(_add(bstarts, tcode, tstep * steps),
+                                calendar))
+        ends.append(_position(_add(bstarts, tcode, tstep * (steps + 1)),
+                              calendar))
+        values.append(np.concatenate([
+            np.repeat(vals, nov) if len(vals) < nov else vals
+            for _, _, _, nov, vals in same]))
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends)
+    values = np.concatenate(values).astype('f8')
+
+    # Pair each value with every requested interval it overlaps.
+    first = np.searchsorted(bounds, starts, side='right') - 1
+    last = np.searchsorted(bounds, ends, side='left') - 1
+    first = np.clip(first, 0, nval - 1)
+    last = np.clip(last, -1, nval - 1)
+    counts = np.maximum(last - first + 1, 0)
+    index = np.repeat(np.arange(len(values)), counts)
+    interval = (np.repeat(first - np.cumsum(counts) + counts, counts) +
+                np.arange(counts.sum()))
+    overlap = (np.minimum(ends[index], bounds[interval + 1]) -
+               np.maximum(starts[index], bounds[interval]))
+    keep = overlap > 0
+    index = index[keep]
+    interval = interval[keep]
+    overlap = overlap[keep].astype('f8')
+    vals = values[index]
+
+    covered = np.bincount(interval, weights=overlap, minlength=nval)
+    has_data = covered > 0
+    if dtran == 2:
+        result = np.full(nval, -np.inf)
+        np.maximum.at(result, interval, vals)
+    elif dtran == 3:
+        result = np.full(nval, np.inf)
+        np.minimum.at(result, interval, vals)
+    elif dtran == 1:
+        width = (ends[index] - starts[index]).astype('f8')
+        total = np.bincount(interval,
+                            weights=vals * overlap / width,
+                            minlength=nval)
+        fraction = covered / np.diff(bounds)
+        result = np.where(fraction < 1, total / np.where(has_data,
+                                                         fraction,
+                                                         1),
+                          total)
+    else:
+        total = np.bincount(interval, weights=vals * overlap, minlength=nval)
+        result = total / np.where(has_data, covered, 1)
+    rval[has_data] = result[has_data]
+    return rval, 0
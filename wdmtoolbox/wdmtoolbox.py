@@ -9,17 +9,42 @@ from __future__ import print_function
 import os
 import sys
 import datetime
+import threading
 
 # Third party imports
 import mando
-from dateutil.parser import parse as dateparser
 
 # Local imports
 # Load in WDM subroutines
 from . import wdmutil
-from tstoolbox import tsutils
+from . import server
 
-WDM = wdmutil.WDM()
+# PANDAS, tstoolbox, and dateutil are imported by the functions that use
+# them, and the WDM library is loaded by the first use of WDM, to keep the
+# start up of the commands that only need the WDM labels short.
+
+
+class _LazyWDM(object):
+    """Make the shared WDM instance on first use."""
+
+    def __init__(self):
+        object.__setattr__(self, '_lock', threading.Lock())
+        object.__setattr__(self, '_wdm', None)
+
+    def _instance(self):
+        with self._lock:
+            if self._wdm is None:
+                object.__setattr__(self, '_wdm', wdmutil.WDM())
+        return self._wdm
+
+    def __getattr__(self, name):
+        return getattr(self._instance(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._instance(), name, value)
+
+
+WDM = _LazyWDM()
 
 
 def _describedsn(wdmpath, dsn):
@@ -28,10 +53,12 @@ def _describedsn(wdmpath, dsn):
 
 
 def _copy_dsn(inwdmpath, indsn, outwdmpath, outdsn):
-    """The local underlying function to copy a DSN."""
+    """The local underlying function to copy a DSN.
+
+    Returns the number of values copied.
+    """
     WDM.copydsnlabel(inwdmpath, indsn, outwdmpath, outdsn)
-    nts = WDM.read_dsn(inwdmpath, indsn)
-    WDM.write_dsn(outwdmpath, int(outdsn), nts)
+    return WDM.copy_dsn_data(inwdmpath, indsn, outwdmpath, outdsn)
 
 
 @mando.command
@@ -43,17 +70,7 @@ def copydsn(inwdmpath, indsn, outwdmpath, outdsn):
     :param outwdmpath: Path to clean copy WDM file.
     :param outdsn: Target DSN.
     """
-    if inwdmpath == outwdmpath:
-        import tempfile
-        tempdir = tempfile.mkdtemp()
-        tmpwdmpath = os.path.join(tempdir, 'temp.wdm')
-        createnewwdm(tmpwdmpath)
-        _copy_dsn(inwdmpath, indsn, tmpwdmpath, outdsn)
-        _copy_dsn(tmpwdmpath, outdsn, outwdmpath, outdsn)
-        os.remove(tmpwdmpath)
-        os.removedirs(tempdir)
-    else:
-        _copy_dsn(inwdmpath, indsn, outwdmpath, outdsn)
+    _copy_dsn(inwdmpath, indsn, outwdmpath, outdsn)
 
 
 @mando.command
@@ -64,25 +81,37 @@ def cleancopywdm(inwdmpath, outwdmpath, overwrite=False):
     :param outwdmpath: Path to clean copy WDM file.
     :param overwrite: Whether to overwrite an existing outwdmpath.
     """
+    from tstoolbox import tsutils
     if inwdmpath == outwdmpath:
         raise ValueError("""
 *
 *   The "inwdmpath" cannot be the same as "outwdmpath".
 *
 """)
+    import time
+
     createnewwdm(outwdmpath, overwrite=overwrite)
-    activedsn = []
-    for i in range(1, 32000):
-        try:
-            activedsn.append(_describedsn(inwdmpath, i)['dsn'])
-        except wdmutil.WDMError:
-            continue
-    # Copy labels (which copies DSN metadata and data)
-    for i in activedsn:
-        try:
-            _copy_dsn(inwdmpath, i, outwdmpath, i)
-        except wdmutil.WDMError:
-            pass
+    start = time.time()
+    nvalues = 0
+    # Both files stay open for the whole copy.
+    with WDM.session(inwdmpath), WDM.session(outwdmpath, mode='w'):
+        activedsn = sorted(WDM.describe_dsns(inwdmpath))
+        # Copy labels (which copies DSN metadata and data)
+        for i in activedsn:
+            try:
+                nvalues = nvalues + _copy_dsn(inwdmpath, i, outwdmpath, i)
+            except wdmutil.WDMError:
+                pass
+    seconds = max(time.time() - start, 1e-6)
+
+    if tsutils.test_cli() is True:
+        megabytes = os.path.getsize(inwdmpath) / 1048576.0
+        print('Copied {0} DSNs, {1} values, from {2:.1f} MB in {3:.2f} '
+              'seconds ({4:.1f} MB/s).'.format(len(activedsn),
+                                                nvalues,
+                                                megabytes,
+                                                seconds,
+                                                megabytes / seconds))
 
 
 @mando.command
@@ -115,6 +144,7 @@ def wdmtoswmm5rdii(wdmpath, *dsns, **kwds):
     :param start_date: If not given defaults to start of data set.
     :param end_date:   If not given defaults to end of data set.
     """
+    from dateutil.parser import parse as dateparser
     start_date = kwds.setdefault('start_date', None)
     end_date = kwds.setdefault('end_date', None)
 
@@ -167,40 +197,180 @@ def wdmtoswmm5rdii(wdmpath, *dsns, **kwds):
         print(str(dsn) + '_' + location)
     print('Node Year Mon Day Hr Min Sec Flow')
     # Can pick any time series because they should all have the same interval
-    # and start and end dates.
-    for dex, date in enumerate(tmp.index):
-        for dsn, location in collect_keys:
-            print(
-                '{0}_{1} {2} {3:02} {4:02} {5:02} {6:02} {7:02} {8}'.format(
-                    dsn, location, date.year, date.month, date.day, date.hour,
-                    date.minute, date.second,
-                    collected_ts[(dsn, location)][dex]))
+    # and start and end dates.  The lines are formatted and written by
+    # DataFrame.to_csv a block of time steps at a time, with every node
+    # written for a time step before the next time step.
+    import pandas as pd
+    nodes = pd.np.array(['{0}_{1}'.format(dsn, location)
+                         for dsn, location in collect_keys])
+    values = pd.np.column_stack([collected_ts[key][:, 0]
+                                 for key in collect_keys])
+    columns = ['Node', 'Year', 'Mon', 'Day', 'Hr', 'Min', 'Sec', 'Flow']
+    # Look up the zero padded strings instead of using strftime, which
+    # formats one date at a time.
+    padded = pd.np.array(['{0:02}'.format(i) for i in range(100)],
+                         dtype=object)
+    block = max(1, 1000000 // len(nodes))
+    for start in range(0, len(tmp.index), block):
+        dates = tmp.index[start:start + block]
+        years, inverse = pd.np.unique(dates.year, return_inverse=True)
+        lines = [pd.np.tile(nodes, len(dates)),
+                 pd.np.repeat(pd.np.array([str(i) for i in years],
+                                          dtype=object)[inverse],
+                              len(nodes))]
+        for field in [dates.month, dates.day, dates.hour, dates.minute,
+                      dates.second]:
+            lines.append(pd.np.repeat(padded[pd.np.asarray(field)],
+                                      len(nodes)))
+        lines.append(values[start:start + block].ravel())
+        lines = pd.DataFrame(dict(zip(columns, lines)), columns=columns)
+        lines.to_csv(sys.stdout,
+                     sep=' ',
+                     header=False,
+                     index=False,
+                     float_format='%.9g',
+                     na_rep='nan')
+
+
+def _read_file_labels(args):
+    """Read the [index, dsn] pairs from one WDM file in a worker process.
+
+    Returns a list of [index, time-series].
+    """
+    wdmpath, dsns, kwds = args
+    with WDM.session(wdmpath):
+        return [[index, WDM.read_dsn(wdmpath, int(dsn), **kwds)]
+                for index, dsn in dsns]
+
+
+def _read_labels(labels, keep_open=False, jobs=None, **kwds):
+    """Return the time-series for each [wdmpath, dsn] in labels, in order.
+
+    The keywords are passed through to WDM.read_dsn.  With keep_open the
+    DSNs are read file by file, holding each WDM file open in a session
+    while all of its DSNs are read.  With `jobs` greater than 1 the files
+    are shared out to that many worker processes, each with its own copy
+    of the WDM library, and all DSNs of a file are read by the same worker.
+    """
+    if jobs is not None and int(jobs) > 1:
+        import multiprocessing
+
+        byfile = {}
+        for index, lab in enumerate(labels):
+            byfile.setdefault(lab[0], []).append([index, lab[1]])
+        tasks = [[wdmpath, byfile[wdmpath], kwds]
+                 for wdmpath in sorted(byfile)]
+        pool = multiprocessing.Pool(min(int(jobs), len(tasks)))
+        try:
+            collect = dict(i for task in pool.map(_read_file_labels, tasks)
+                           for i in task)
+        finally:
+            pool.close()
+            pool.join()
+        return [collect[index] for index in range(len(labels))]
+
+    if not keep_open:
+        return (WDM.read_dsn(wdmpath,
+                             int(dsn),
+                             **kwds) for wdmpath, dsn in labels)
+
+    collect = {}
+    for wdmpath in sorted(set(lab[0] for lab in labels)):
+        with WDM.session(wdmpath):
+            for index, lab in enumerate(labels):
+                if lab[0] == wdmpath:
+                    collect[index] = WDM.read_dsn(wdmpath,
+                                                  int(lab[1]),
+                                                  **kwds)
+    return [collect[index] for index in range(len(labels))]
+
+
+def _iter_chunks(labels, chunksize, start_date=None, end_date=None, **kwds):
+    """Yield the time-series for labels one calendar chunk at a time.
+
+    The `chunksize` is a PANDAS offset alias, for example 'AS' for a chunk
+    per year.  Each chunk has a column for every label.  The keywords are
+    passed through to WDM.read_dsn.
+    """
+    from dateutil.parser import parse as dateparser
+    import pandas as pd
+
+    names = []
+    periods = []
+    for wdmpath, dsn in labels:
+        names.append(WDM.dsn_name(wdmpath, int(dsn)))
+        desc = _describedsn(wdmpath, dsn)
+        if desc['start_date'] is None:
+            # No data in this DSN.
+            periods.append(None)
+            continue
+        periods.append((dateparser(desc['start_date']),
+                        dateparser(desc['end_date'])))
+    if not any(periods):
+        return
+    por_start = min(i[0] for i in periods if i)
+    por_end = max(i[1] for i in periods if i)
+    if start_date is not None:
+        por_start = max(por_start, dateparser(str(start_date)))
+    if end_date is not None:
+        por_end = min(por_end, dateparser(str(end_date)))
+
+    edges = [por_start]
+    for date in pd.date_range(pd.Timestamp(por_start).normalize(),
+                              por_end,
+                              freq=chunksize):
+        if por_start < date <= por_end:
+            edges.append(date.to_pydatetime())
+    ends = [i - datetime.timedelta(seconds=1) for i in edges[1:]] + [por_end]
+
+    for chunk_start, chunk_end in zip(edges, ends):
+        chunk = []
+        for (wdmpath, dsn), period in zip(labels, periods):
+            if (period is None or
+                    chunk_start > period[1] or chunk_end < period[0]):
+                continue
+            chunk.append(WDM.read_dsn(wdmpath,
+                                      int(dsn),
+                                      start_date=chunk_start,
+                                      end_date=chunk_end,
+                                      **kwds))
+        if chunk:
+            yield pd.concat(chunk, axis=1).reindex(columns=names)
 
 
 def extract(*wdmpath, **kwds):
     """Print out DSN data to the screen with ISO-8601 dates.
 
-    This is the API version also used by 'extract_cli'
+    This is the API version also used by 'extract_cli'.  With the
+    `as_dict` keyword set to True returns a dictionary of the time-series
+    keyed by column name, without aligning them to a common index.
     """
+    from tstoolbox import tsutils
     # Adapt to both forms of presenting wdm files and DSNs
     # Old form '... file.wdm 101 102 103 ...'
     # New form '... file.wdm,101 adifferentfile.wdm,101 ...
-    try:
-        start_date = kwds.pop('start_date')
-    except KeyError:
-        start_date = None
-    try:
-        end_date = kwds.pop('end_date')
-    except KeyError:
-        end_date = None
+    start_date = kwds.pop('start_date', None)
+    end_date = kwds.pop('end_date', None)
+    keep_open = kwds.pop('keep_open', False)
+    resample = kwds.pop('resample', None)
+    transform = kwds.pop('transform', None)
+    chunksize = kwds.pop('chunksize', None)
+    jobs = kwds.pop('jobs', None)
+    as_dict = kwds.pop('as_dict', False)
     if len(kwds) > 0:
         raise ValueError("""
 *
-*   The only allowed keywords are start_date and end_date.  You
-*   have given {0}.
+*   The only allowed keywords are start_date, end_date, keep_open,
+*   resample, transform, chunksize, jobs, and as_dict.  You have given
+*   {0}.
 *
 """.format(kwds))
 
+    tcode = None
+    tstep = None
+    if resample is not None:
+        tcode, tstep = _freq_to_tcode(resample)
+
     labels = []
     for lab in wdmpath:
         if ',' in str(lab):
@@ -210,29 +380,59 @@ def extract(*wdmpath, **kwds):
                 continue
             labels.append([wdmpath[0], lab])
 
-    for index, lab in enumerate(labels):
-        wdmpath = lab[0]
-        dsn = lab[1]
-        nts = WDM.read_dsn(wdmpath,
-                           int(dsn),
-                           start_date=start_date,
-                           end_date=end_date)
-        if index == 0:
-            result = nts
-        else:
-            try:
-                result = result.join(nts, how='outer')
-            except:
-                raise ValueError("""
+    if chunksize is not None:
+        chunks = _iter_chunks(labels,
+                              chunksize,
+                              start_date=start_date,
+                              end_date=end_date,
+                              tcode=tcode,
+                              tstep=tstep,
+                              transform=transform)
+        if tsutils.test_cli() is True:
+            for index, chunk in enumerate(chunks):
+                chunk.to_csv(sys.stdout,
+                             float_format='%.9g',
+                             header=(index == 0))
+            return
+        chunks = list(chunks)
+        if chunks:
+            import pandas as pd
+            return pd.concat(chunks)
+
+    result = list(_read_labels(labels,
+                               keep_open=keep_open,
+                               jobs=jobs,
+                               start_date=start_date,
+                               end_date=end_date,
+                               tcode=tcode,
+                               tstep=tstep,
+                               transform=transform))
+    names = set()
+    for nts in result:
+        if nts.columns[0] in names:
+            raise ValueError("""
 *
 *   The column {0} is duplicated.  Dataset names must be unique.
 *
 """.format(nts.columns[0]))
+        names.add(nts.columns[0])
+
+    if as_dict is True:
+        return dict((nts.columns[0], nts.iloc[:, 0]) for nts in result)
+
+    # One concat aligns everything to the union of the indexes at once,
+    # where joining one DSN at a time would copy the growing frame each time.
+    import pandas as pd
+    result = pd.concat(result, axis=1)
+    if not result.index.is_monotonic_increasing:
+        result = result.sort_index()
     return tsutils.printiso(result)
 
 
 @mando.command('extract')
-def extract_cli(start_date=None, end_date=None, *wdmpath):
+def extract_cli(start_date=None, end_date=None, keep_open=False,
+                resample=None, transform='mean', chunksize=None, jobs=None,
+                *wdmpath):
     """Print out DSN data to the screen with ISO-8601 dates.
 
     :param wdmpath: Path and WDM filename followed by space separated list of
@@ -247,8 +447,28 @@ def extract_cli(start_date=None, end_date=None, *wdmpath):
                         'file.wdm,101 file2.wdm,104 file.wdm,227'
     :param start_date: If not given defaults to start of data set.
     :param end_date:   If not given defaults to end of data set.
+    :param keep_open:  Keep each WDM file open while all of its DSNs are
+                       read instead of opening and closing it for each
+                       access.  Defaults to False.
+    :param resample:   PANDAS offset alias of the interval to aggregate to
+                       while reading, for example 'D' or '6H'.  The WDM
+                       library does the aggregation.  If not given the DSN
+                       interval is used.
+    :param transform:  How to aggregate values when using 'resample', one of
+                       'mean', 'sum', 'max', or 'min'.  Defaults to 'mean'.
+    :param chunksize:  PANDAS offset alias, for example 'AS' for yearly,
+                       to read and print the data one chunk at a time
+                       instead of all at once.  Use for very long
+                       time-series.  If not given prints all at once.
+    :param jobs:       Number of worker processes used to read the data.
+                       The WDM files are shared out between the workers,
+                       so this only helps when reading from several WDM
+                       files.  Not used with 'chunksize'.  Defaults to
+                       reading everything in this process.
     """
-    return extract(*wdmpath, start_date=start_date, end_date=end_date)
+    return extract(*wdmpath, start_date=start_date, end_date=end_date,
+                   keep_open=keep_open, resample=resample,
+                   transform=transform, chunksize=chunksize, jobs=jobs)
 
 
 @mando.command
@@ -267,30 +487,17 @@ def describedsn(wdmpath, dsn):
     print(_describedsn(wdmpath, dsn))
 
 
-@mando.command
-def listdsns(wdmpath):
-    """Print out a table describing all DSNs in the WDM.
-
-    :param wdmpath: Path and WDM filename.
-    """
-    if not os.path.exists(wdmpath):
-        raise ValueError("""
-*
-*   File {0} does not exist.
-*
-""".format(wdmpath))
-
+def _dsn_table(dsn_descs):
+    """Print the DSN descriptions as a table, or return them if not CLI."""
+    from tstoolbox import tsutils
     dsn_info = {}
     cli = tsutils.test_cli()
     if cli is True:
         print('#{0:<4} {1:>8} {2:>8} {3:>8} {4:<19} {5:<19} {6:>5} {7}'.format(
             'DSN', 'SCENARIO', 'LOCATION', 'CONSTITUENT', 'START DATE',
             'END DATE', 'TCODE', 'TSTEP'))
-    for i in range(1, 32001):
-        try:
-            testv = _describedsn(wdmpath, i)
-        except wdmutil.WDMError:
-            continue
+    for i in sorted(dsn_descs):
+        testv = dsn_descs[i]
         if cli is True:
             print('{dsn:5} {scenario!s:8} {location!s:8} {constituent!s:8}    {start_date!s:19} {end_date!s:19} {tcode_name!s:>5}({tcode}) {tstep}'.format(**testv))
         else:
@@ -299,6 +506,54 @@ def listdsns(wdmpath):
         return dsn_info
 
 
+def _check_exists(wdmpath):
+    """Raise a ValueError if wdmpath does not exist."""
+    if not os.path.exists(wdmpath):
+        raise ValueError("""
+*
+*   File {0} does not exist.
+*
+""".format(wdmpath))
+
+
+@mando.command
+def listdsns(wdmpath, catalog=False):
+    """Print out a table describing all DSNs in the WDM.
+
+    :param wdmpath: Path and WDM filename.
+    :param catalog: Answer from the catalog file kept next to the WDM file,
+                    'wdmpath.catalog', which is made or brought up to date
+                    first if needed.  Defaults to False.
+    """
+    _check_exists(wdmpath)
+    if catalog is True:
+        from . import catalog as wdmcatalog
+        return _dsn_table(wdmcatalog.describe_dsns(WDM, wdmpath))
+    return _dsn_table(WDM.describe_dsns(wdmpath))
+
+
+@mando.command
+def finddsns(wdmpath, scenario=None, location=None, constituent=None):
+    """Print out a table describing the DSNs that match.
+
+    Answers from the catalog file kept next to the WDM file,
+    'wdmpath.catalog', which is made or brought up to date first if the WDM
+    file changed.
+
+    :param wdmpath: Path and WDM filename.
+    :param scenario: Only DSNs with this scenario, ignoring case.
+    :param location: Only DSNs with this location, ignoring case.
+    :param constituent: Only DSNs with this constituent, ignoring case.
+    """
+    from . import catalog as wdmcatalog
+    _check_exists(wdmpath)
+    return _dsn_table(wdmcatalog.find_dsns(WDM,
+                                           wdmpath,
+                                           scenario=scenario,
+                                           location=location,
+                                           constituent=constituent))
+
+
 @mando.command
 def createnewwdm(wdmpath, overwrite=False):
     """Create a new WDM file, optional to overwrite.
@@ -347,6 +602,67 @@ def createnewdsn(wdmpath, dsn, tstype='', base_year=1900, tcode=4, tsstep=1,
                        tsfill=tsfill)
 
 
+@mando.command
+def createnewdsns(wdmpath, manifest):
+    """Create many new DSNs from a CSV or JSON manifest.
+
+    The WDM file is held open while all of the DSNs are created.  Records
+    that cannot be created are reported together at the end, after all of
+    the other DSNs have been created.
+
+    :param wdmpath: Path and WDM filename.
+    :param manifest: A CSV file with a header, or a JSON file (ending in
+                     '.json') with a list of objects.  Each record has a
+                     'dsn' and any of the 'createnewdsn' options, 'tstype',
+                     'base_year', 'tcode', 'tsstep', 'statid', 'scenario',
+                     'location', 'description', 'constituent', and
+                     'tsfill'.  Missing or empty options use the
+                     'createnewdsn' defaults.
+    """
+    if manifest.lower().endswith('.json'):
+        import json
+        with open(manifest) as fpi:
+            records = json.load(fpi)
+    else:
+        import csv
+        with open(manifest) as fpi:
+            records = list(csv.DictReader(fpi))
+
+    collect = []
+    positions = []
+    errors = []
+    for position, record in enumerate(records):
+        if None in record:
+            # csv.DictReader puts the fields past the header under None.
+            errors.append([position,
+                           record.get('dsn'),
+                           'The row has more fields than the header.'])
+            continue
+        record = dict((key.strip(), value) for key, value in record.items()
+                      if value is not None and str(value).strip() != '')
+        constituent = str(record.get('constituent', ''))
+        if 'tstype' not in record and len(constituent) > 0:
+            record['tstype'] = constituent[:4]
+        collect.append(record)
+        positions.append(position)
+
+    for position, dsn, message in WDM.create_many_dsns(wdmpath, collect):
+        errors.append([positions[position], dsn, message])
+    errors.sort(key=lambda error: error[0])
+    if errors:
+        raise ValueError("""
+*
+*   {0} of the {1} DSNs could not be created:
+*
+{2}
+*
+""".format(len(errors), len(records),
+           '\n'.join('*   record {0} (DSN {1}): {2}'.format(position + 1,
+                                                           dsn,
+                                                           message)
+                     for position, dsn, message in errors)))
+
+
 @mando.command
 def hydhrseqtowdm(wdmpath, dsn, input_ts=sys.stdin, start_century=1900):
     """Write HYDHR sequential file to a DSN.
@@ -357,37 +673,69 @@ def hydhrseqtowdm(wdmpath, dsn, input_ts=sys.stdin, start_century=1900):
     :param start_century: Since 2 digit years are used, need century, defaults
                           to 1900.
     """
-    import pandas as pd
     dsn = int(dsn)
     if isinstance(input_ts, str):
-        input_ts = open(input_ts, 'r')
-    dates = pd.np.array([])
-    data = pd.np.array([])
-    for line in input_ts:
-        words = line[8:]
-        words = words.split()
-        year = int(words[0]) + start_century
-        month = int(words[1])
-        day = int(words[2])
-        ampmflag = int(words[3])
-        if int(words[0]) == 99 and month == 12 and day == 31 and ampmflag == 2:
-            start_century = start_century + 100
-        data = pd.np.append(data, [float(i) for i in words[4:16]])
-        try:
-            if ampmflag == 1:
-                dates = pd.np.append(dates,
-                                     [datetime.datetime(year, month, day, i)
-                                      for i in range(0, 12)])
-            if ampmflag == 2:
-                dates = pd.np.append(dates,
-                                     [datetime.datetime(year, month, day, i)
-                                      for i in range(12, 24)])
-        except ValueError:
-            print(start_century, line)
-    data = pd.DataFrame(data, index=dates)
+        with open(input_ts, 'r') as fpi:
+            data = _read_hydhrseq(fpi, int(start_century))
+    else:
+        data = _read_hydhrseq(input_ts, int(start_century))
     _writetodsn(wdmpath, dsn, data)
 
 
+def _read_hydhrseq(input_ts, start_century=1900):
+    """Read a HYDHR sequential file into a DataFrame of hourly values.
+
+    Each line has an 8 character station identifier, then a 2 digit year,
+    month, day, a flag of 1 for the hours 0 to 11 or 2 for the hours 12 to
+    23, and the 12 values.  The century goes up by 100 after the line for
+    the afternoon of December 31st of a year '99'.
+    """
+    try:
+        from cStringIO import StringIO
+    except ImportError:
+        from io import StringIO
+    import pandas as pd
+
+    text = ''.join(line[8:] for line in input_ts)
+    table = pd.read_csv(StringIO(text),
+                        sep=r'\s+',
+                        header=None,
+                        usecols=list(range(16))).values
+    if len(table) == 0:
+        return pd.DataFrame(pd.np.array([]), index=pd.DatetimeIndex([]))
+
+    yy, month, day, ampmflag = table[:, :4].astype('int64').T
+    bad = pd.np.flatnonzero((ampmflag != 1) & (ampmflag != 2))
+    if len(bad) > 0:
+        raise ValueError("""
+*
+*   The AM/PM flag must be 1 or 2, but line {0} has {1}.
+*
+""".format(bad[0] + 1, ampmflag[bad[0]]))
+
+    rollover = (yy == 99) & (month == 12) & (day == 31) & (ampmflag == 2)
+    century = start_century + 100 * (pd.np.cumsum(rollover) - rollover)
+    days = pd.to_datetime(pd.DataFrame({'year': yy + century,
+                                        'month': month,
+                                        'day': day}),
+                          errors='coerce')
+    bad = pd.np.flatnonzero(pd.isnull(days).values)
+    if len(bad) > 0:
+        raise ValueError("""
+*
+*   Line {0} has the date {1}-{2}-{3}, which is not a valid date.
+*
+""".format(bad[0] + 1, yy[bad[0]] + century[bad[0]], month[bad[0]],
+           day[bad[0]]))
+
+    hours = (12 * (ampmflag[:, None] - 1) +
+             pd.np.arange(12)[None, :]).ravel()
+    dates = (pd.np.repeat(days.values, 12) +
+             hours.astype('timedelta64[h]'))
+    return pd.DataFrame(table[:, 4:].astype('float64').ravel(),
+                        index=pd.DatetimeIndex(dates))
+
+
 @mando.command
 def stdtowdm(wdmpath, dsn, infile='-'):
     """DEPRECATED: Use 'csvtowdm'."""
@@ -396,7 +744,8 @@ def stdtowdm(wdmpath, dsn, infile='-'):
 
 @mando.command
 def csvtowdm(wdmpath, dsn, input=None, start_date=None,
-             end_date=None, columns=None, input_ts='-'):
+             end_date=None, columns=None, input_ts='-', chunksize=None,
+             append=False, overwrite=False):
     """Write data from a CSV file to a DSN.
 
     File can have comma separated
@@ -417,7 +766,21 @@ def csvtowdm(wdmpath, dsn, input=None, start_date=None,
         column numbers.  If using numbers, column number 1 is the first column.
         To pick multiple columns; separate by commas with no spaces. As used in
         'pick' command.
+    :param chunksize: Number of rows to read from the input and write to the
+        DSN at a time, to write files that are too large to fit in memory.
+        The data must be in time order and at the interval of the DSN.  If
+        not given reads all of the input at once.
+    :param append: Only write the data that comes after the last value
+        already in the DSN, skipping the rows that overlap.  Use to add
+        new data from a file that repeats older data.  Defaults to False.
+    :param overwrite: Replace the values in the DSN for the time steps in
+        the input and keep the data after them.  Without it, writing over
+        data in a DSN deletes all of the data after the input.  With
+        chunksize the data after the input is kept in a spare DSN while the
+        chunks are written, which needs room for it in the WDM file.
+        Defaults to False.
     """
+    from tstoolbox import tsutils
     if input is not None:
         raise ValueError("""
 *
@@ -425,28 +788,114 @@ def csvtowdm(wdmpath, dsn, input=None, start_date=None,
 *   instead.
 *
 """)
+    if append is True and overwrite is True:
+        raise ValueError("""
+*
+*   Use either '--append' or '--overwrite', not both.
+*
+""")
+    if chunksize is not None:
+        import pandas as pd
+        if input_ts == '-':
+            input_ts = sys.stdin
+        chunks = (tsutils.common_kwds(chunk,
+                                      start_date=start_date,
+                                      end_date=end_date,
+                                      pick=columns)
+                  for chunk in pd.read_csv(input_ts,
+                                           index_col=0,
+                                           parse_dates=True,
+                                           chunksize=int(chunksize)))
+        _writetodsn_chunks(wdmpath, dsn, chunks, append=append,
+                           overwrite=overwrite)
+        return
+
     tsd = tsutils.common_kwds(tsutils.read_iso_ts(input_ts),
                               start_date=start_date,
                               end_date=end_date,
                               pick=columns)
+    _writetodsn(wdmpath, dsn, tsd, append=append, overwrite=overwrite)
+
 
-    if len(tsd.columns) > 1:
+@mando.command
+def csvtowdm_multi(wdmpath, dsns, input_ts='-', start_date=None,
+                   end_date=None, columns=None, create=False, overwrite=False):
+    """Write each column of a CSV file to a DSN.
+
+    The input is read once and all of the DSNs are written while the WDM
+    file is held open.
+
+    :param wdmpath: Path and WDM filename.
+    :param dsns: Comma separated Data Set Numbers, one for each column of
+        the input in order.  For example, '101,102,103'.
+    :param input_ts: Filename with data in 'ISOdate,value1,value2,...'
+        format or '-' for stdin.
+    :param start_date: The start_date of the series in ISOdatetime format, or
+        'None' for beginning.
+    :param end_date: The end_date of the series in ISOdatetime format, or
+        'None' for end.
+    :param columns: Columns to pick out of input.  Can use column names or
+        column numbers.  If using numbers, column number 1 is the first column.
+        To pick multiple columns; separate by commas with no spaces. As used in
+        'pick' command.
+    :param create: Create the DSNs that are not in the WDM file, with the
+        time code and time step of the input, and a base year of the first
+        year of the input.  Defaults to False.
+    :param overwrite: Replace the values in the DSNs for the time steps in
+        the input and keep the data after them.  Defaults to False.
+    """
+    from tstoolbox import tsutils
+    if isinstance(dsns, str):
+        dsns = dsns.split(',')
+    dsns = [int(i) for i in dsns]
+    repeated = sorted(set(i for i in dsns if dsns.count(i) > 1))
+    if repeated:
         raise ValueError("""
 *
-*   The input data set must contain only 1 time series.
-*   You gave {0}.
+*   Each column must go to a different DSN.  The DSNs {0} are given more
+*   than once.
 *
-""".format(len(tsd.columns)))
-
-    _writetodsn(wdmpath, dsn, tsd)
-
+""".format(repeated))
 
-def _writetodsn(wdmpath, dsn, data):
-    """Local function to write Pandas data frame to DSN."""
-    data = tsutils.asbestfreq(data)
-    infer = data.index.freqstr
-    pandacode = infer.lstrip('0123456789')
-    tstep = infer[:infer.find(pandacode)]
+    tsd = tsutils.common_kwds(tsutils.read_iso_ts(input_ts),
+                              start_date=start_date,
+                              end_date=end_date,
+                              pick=columns)
+    if len(tsd.columns) != len(dsns):
+        raise ValueError("""
+*
+*   There must be one DSN for each column.  You gave {0} DSNs for {1}
+*   columns.
+*
+""".format(len(dsns), len(tsd.columns)))
+    tsd = tsutils.asbestfreq(tsd)
+
+    with WDM.session(wdmpath, mode='w'):
+        missing = []
+        if create is True:
+            finterval, tstep = _freq_to_tcode(tsd.index.freqstr)
+            existing = set(WDM.list_dsns(wdmpath))
+            missing = [i for i in dsns if i not in existing]
+        # Check every column before any DSN is created.
+        data = {}
+        for index, dsn in enumerate(dsns):
+            if dsn in missing:
+                desc_dsn = {'tcode': finterval, 'tstep': tstep}
+            else:
+                desc_dsn = _describedsn(wdmpath, dsn)
+            data[dsn] = _check_frequency(desc_dsn, tsd.iloc[:, [index]])
+        for dsn in missing:
+            WDM.create_new_dsn(wdmpath, dsn,
+                               base_year=tsd.index[0].year,
+                               tcode=finterval,
+                               tsstep=tstep)
+        WDM.write_many(wdmpath, data, overwrite=overwrite)
+
+
+def _freq_to_tcode(freqstr):
+    """Return the WDM tcode and tstep for a PANDAS frequency string."""
+    pandacode = freqstr.lstrip('0123456789')
+    tstep = freqstr[:freqstr.find(pandacode)]
     try:
         tstep = int(tstep)
     except ValueError:
@@ -475,12 +924,26 @@ def _writetodsn(wdmpath, dsn, data):
 *   wdmtoolbox thinks this series is {0}.
 *
 """.format(pandacode))
+    return finterval, tstep
 
-    # Convert string to int
-    dsn = int(dsn)
 
-    # Make sure that input data metadata matches target DSN
-    desc_dsn = _describedsn(wdmpath, dsn)
+def _check_columns(data):
+    """Raise a ValueError unless data has a single column."""
+    if len(data.columns) > 1:
+        raise ValueError("""
+*
+*   The input data set must contain only 1 time series.
+*   You gave {0}.
+*
+""".format(len(data.columns)))
+
+
+def _check_frequency(desc_dsn, data):
+    """Return data at its best frequency, if that matches the DSN."""
+    from tstoolbox import tsutils
+    _check_columns(data)
+    data = tsutils.asbestfreq(data)
+    finterval, tstep = _freq_to_tcode(data.index.freqstr)
 
     dsntcode = desc_dsn['tcode']
     if finterval != dsntcode:
@@ -497,14 +960,87 @@ def _writetodsn(wdmpath, dsn, data):
 *   The DSN has a tstep of {0}, but the data has a tstep of {1}.
 *
 """.format(dsntstep, tstep))
+    return data
+
+
+def _writetodsn(wdmpath, dsn, data, append=False, overwrite=False):
+    """Local function to write Pandas data frame to DSN.
 
-    WDM.write_dsn(wdmpath, dsn, data)
+    With append only the rows after the data in the DSN are written.  With
+    overwrite the data in the DSN after the rows is kept.
+    """
+    # Convert string to int
+    dsn = int(dsn)
+
+    # Make sure that input data metadata matches target DSN
+    data = _check_frequency(_describedsn(wdmpath, dsn), data)
+
+    if append is True:
+        WDM.append_dsn(wdmpath, dsn, data)
+    else:
+        WDM.write_dsn(wdmpath, dsn, data, overwrite=overwrite)
+
+
+def _writetodsn_chunks(wdmpath, dsn, chunks, append=False, overwrite=False):
+    """Write an iterable of Pandas data frames one after another to DSN.
+
+    The columns and frequency of each chunk are checked against the DSN,
+    then the chunks are written with WDM.write_chunks.
+    """
+    dsn = int(dsn)
+    desc_dsn = _describedsn(wdmpath, dsn)
+
+    def checked():
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            _check_columns(chunk)
+            # A chunk needs 3 values to find its frequency.
+            if len(chunk) > 2:
+                _check_frequency(desc_dsn, chunk)
+            yield chunk
+
+    WDM.write_chunks(wdmpath, dsn, checked(), append=append,
+                     overwrite=overwrite)
+
+
+@mando.command
+def serve(stop=False, status=False, cache_size=0):
+    """Serve extract, describedsn, and listdsns from a long running process.
+
+    Loads the WDM library once and keeps the WDM files open between
+    requests.  While the server runs, the extract, describedsn, and
+    listdsns commands are sent to it, which saves the start up of PANDAS
+    and the WDM library on every call.  'extract --chunksize' is not sent,
+    so that it still prints each chunk as it is read.  Clients find the
+    server through the file named by the WDMTOOLBOX_SERVER environment
+    variable, by default '.wdmtoolbox_server' in the home directory, and
+    can only connect with the key in that file.  Set WDMTOOLBOX_SERVER to
+    an empty string to run the commands without the server.
+
+    :param stop: Stop the running server.
+    :param status: Print the status of the running server.
+    :param cache_size: The number of bytes of DSN data to keep in memory
+        between requests.  The default of 0 does not keep any.
+    """
+    if stop is True:
+        server.stop()
+    elif status is True:
+        print(server.status())
+    else:
+        server.serve(WDM, cache_size=cache_size)
 
 
 def main():
     """Main function."""
     if not os.path.exists('debug_wdmtoolbox'):
         sys.tracebacklimit = 0
+    reply = server.forward(sys.argv[1:])
+    if reply is not None:
+        out, err, code = reply
+        sys.stdout.write(out)
+        sys.stderr.write(err)
+        sys.exit(code)
     mando.main()
 
 
@@ -8,16 +8,16 @@ routines.
 
 from __future__ import print_function
 
+import collections
+import contextlib
+import copy
 import datetime
+import functools
 import os
 import os.path
 import re
 import sys
-
-import pandas as pd
-
-import _wdm_lib
-from tstoolbox import tsutils
+import threading
 
 # Load in WDM subroutines
 
@@ -40,6 +40,19 @@ MAPFREQ = {
     'A': 6,
     }
 
+# The WDM library can have this many WDM files open at once, counting the
+# message file (MXWDM in CFBUFF.INC).
+MXWDM = 5
+
+# Mapping between transformation names and the WDM DTRAN codes used by
+# wdtget when the requested interval is different than the DSN interval
+MAPDTRAN = {
+    'mean': 0,
+    'sum': 1,
+    'max': 2,
+    'min': 3,
+    }
+
 
 class WDMError(Exception):
     """The default Error class."""
@@ -103,54 +116,208 @@ class DSNExistsError(Exception):
 """.format(self.dsn)
 
 
+def _abspath(wdmpath):
+    """Return the absolute path used to keep track of a WDM file."""
+    return os.path.abspath(wdmpath.strip())
+
+
+def _stamp(wdmpath):
+    """Return the inode, modification time, and size of a WDM file."""
+    stat = os.stat(_abspath(wdmpath))
+    return (stat.st_ino, repr(stat.st_mtime), stat.st_size)
+
+
+class _NoLock(object):
+    """Stands in for the library lock where it is not needed."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NOLOCK = _NoLock()
+
+
+def _message_file():
+    """Return the path of the WDM message file."""
+    return os.path.join(sys.prefix, 'share', 'wdmtoolbox', 'message.wdm')
+
+
+def _check_exists(wdmpath):
+    """Raise ValueError if the WDM file does not exist."""
+    if not os.path.exists(wdmpath):
+        raise ValueError("""
+***
+*** {0} does not exist.
+***
+""".format(wdmpath))
+
+
+def _naive(timestamp):
+    """Return the PANDAS Timestamp as a datetime.datetime without time zone."""
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_localize(None)
+    return timestamp.to_pydatetime()
+
+
+def _same_file(wdmpath1, wdmpath2):
+    """Return True if the two paths name the same WDM file."""
+    return _abspath(wdmpath1) == _abspath(wdmpath2)
+
+
+def _locked(method):
+    """Run a WDM method that opens `wdmpath` with the file and library locks.
+
+    The per-file lock keeps other threads away from the file from the open
+    to the close, and the library lock serializes the calls into the WDM
+    library, which keeps all of its state in COMMON blocks.  The 'numpy'
+    backend only takes the per-file lock.
+    """
+    @functools.wraps(method)
+    def wrapper(self, wdmpath, *args, **kwds):
+        with self._file_lock(wdmpath), self._library_lock():
+            return method(self, wdmpath, *args, **kwds)
+    return wrapper
+
+
 class WDM(object):
-    """Class to open and read from WDM files."""
-
-    def __init__(self):
-        """Set functions from WDM library to class function objects."""
-        # timcvt: Convert times to account for 24 hour
-        # timdif: Time difference
-        # wdmopn: Open WDM file
-        # wdbsac: Set string attribute
-        # wdbsai: Set integer attribute
-        # wdbsar: Set real attribute
-        # wdbckt: Check if DSN exists
-        # wdflcl: Close WDM file
-        # wdlbax: Create label for new DSN
-        # wdtget: Get time-series data
-        # wdtput: Write time-series data
-        # wddsrn: Renumber a DSN
-        # wddsdl: Delete a DSN
-        # wddscl: Copy a label
-
-        self.timcvt = _wdm_lib.timcvt
-        self.timdif = _wdm_lib.timdif
-        self.wdbopn = _wdm_lib.wdbopn
-        self.wdbsac = _wdm_lib.wdbsac
-        self.wdbsai = _wdm_lib.wdbsai
-        self.wdbsar = _wdm_lib.wdbsar
-        self.wdbsgc = _wdm_lib.wdbsgc
-        self.wdbsgi = _wdm_lib.wdbsgi
-        self.wdbsgr = _wdm_lib.wdbsgr
-        self.wdckdt = _wdm_lib.wdckdt
-        self.wdflcl = _wdm_lib.wdflcl
-        self.wdlbax = _wdm_lib.wdlbax
-        self.wdtget = _wdm_lib.wdtget
-        self.wdtput = _wdm_lib.wdtput
-        self.wtfndt = _wdm_lib.wtfndt
-        self.wddsrn = _wdm_lib.wddsrn
-        self.wddsdl = _wdm_lib.wddsdl
-        self.wddscl = _wdm_lib.wddscl
-
-        self.openfiles = {}
+    """Class to open and read from WDM files.
+
+    A WDM instance can be shared between threads.  Calls into the WDM
+    library are serialized, and each WDM file is used by one thread at a
+    time, for the length of a method call or a `session`.  Work outside of
+    the library, like building the DataFrames in read_dsn, runs in
+    parallel.  Threads that hold sessions on more than one file at a time
+    should open the sessions in the same order.
+    """
+
+    def __init__(self, backend='fortran', cache_size=0):
+        """Set functions from WDM library to class function objects.
+
+        The `backend` is 'fortran' to use the WDM library, or 'numpy' to
+        read the WDM files through a memory map with wdmnumpy.  The 'numpy'
+        backend is read-only, but has no limit on the number of open files
+        and does not need the compiled WDM library.
+
+        The `cache_size` is the number of bytes of read_dsn results to keep
+        in a least recently used cache, or 0 for no cache.  It can also be
+        changed later through the `cache_size` attribute.
+        """
+        if backend not in ['fortran', 'numpy']:
+            raise ValueError("""
+*
+*   The backend must be 'fortran' or 'numpy', not '{0}'.
+*
+""".format(backend))
+        self.backend = backend
+
+        if backend == 'numpy':
+            from . import wdmnumpy
+
+            # Nothing comes from the WDM library, so the 'numpy' backend
+            # works without the compiled extension and shares no state
+            # between threads.
+            for name in ['timcvt', 'timdif', 'timadd', 'wdbopn', 'wdflcl',
+                         'wdbsgc', 'wdbsgi', 'wdbsgr', 'wdckdt', 'wdtget',
+                         'wtfndt', 'wddsnx']:
+                setattr(self, name, getattr(wdmnumpy, name))
+            for name in ['wdbsac', 'wdbsai', 'wdbsar', 'wdlbax', 'wdtput',
+                         'wddsrn', 'wddsdl', 'wddscl']:
+                setattr(self, name, self._read_only)
+        else:
+            # The WDM library, and numpy with it, is loaded by the first WDM
+            # instance rather than on import.
+            import _wdm_lib
+
+            # timcvt: Convert times to account for 24 hour
+            # timdif: Time difference
+            # timadd: Add time steps to a date
+            # wdmopn: Open WDM file
+            # wdbsac: Set string attribute
+            # wdbsai: Set integer attribute
+            # wdbsar: Set real attribute
+            # wdbckt: Check if DSN exists
+            # wdflcl: Close WDM file
+            # wdlbax: Create label for new DSN
+            # wdtget: Get time-series data
+            # wdtput: Write time-series data
+            # wddsrn: Renumber a DSN
+            # wddsdl: Delete a DSN
+            # wddscl: Copy a label
+            # wddsnx: Find the next existing DSN
+
+            self.timcvt = _wdm_lib.timcvt
+            self.timdif = _wdm_lib.timdif
+            self.timadd = _wdm_lib.timadd
+            self.wdbopn = _wdm_lib.wdbopn
+            self.wdbsac = _wdm_lib.wdbsac
+            self.wdbsai = _wdm_lib.wdbsai
+            self.wdbsar = _wdm_lib.wdbsar
+            self.wdbsgc = _wdm_lib.wdbsgc
+            self.wdbsgi = _wdm_lib.wdbsgi
+            self.wdbsgr = _wdm_lib.wdbsgr
+            self.wdckdt = _wdm_lib.wdckdt
+            self.wdflcl = _wdm_lib.wdflcl
+            self.wdlbax = _wdm_lib.wdlbax
+            self.wdtget = _wdm_lib.wdtget
+            self.wdtput = _wdm_lib.wdtput
+            self.wtfndt = _wdm_lib.wtfndt
+            self.wddsrn = _wdm_lib.wddsrn
+            self.wddsdl = _wdm_lib.wddsdl
+            self.wddscl = _wdm_lib.wddscl
+            self.wddsnx = _wdm_lib.wddsnx
+
+        # openfiles: the open files, least recently used first
+        self.openfiles = collections.OrderedDict()
+        self.sessions = {}
+
+        # lock: serializes calls into the WDM library and changes to
+        #       openfiles and sessions, see _library_lock
+        # file_locks: a lock for each WDM file, keyed by absolute path
+        self.lock = threading.RLock()
+        self.file_locks = {}
+
+        # cache: read_dsn results, least recently used first, keyed by
+        #        _cache_key
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        self.cache_bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # labels: describe_dsn results for each WDM file, keyed by absolute
+        #         path, see _labels
+        self.labels = {}
+
+        # keep_open: leave the files open after each call until close_files,
+        #            for a long running reader like 'wdmtoolbox serve'
+        # openstamps: the _stamp of each open file when it was opened
+        self.keep_open = False
+        self.openstamps = {}
+
+    def _read_only(self, *args):
+        """Stand in for the WDM library functions that write to a file.
+
+        Closes the files opened for the refused call, which are among its
+        arguments.  Files that other threads are reading stay open.
+        """
+        with self.lock:
+            refused = [wdmpath for wdmpath, wdmfp in self.openfiles.items()
+                       if any(wdmfp is i for i in args)]
+        for wdmpath in refused:
+            self._close(wdmpath, force=True)
+        raise WDMError("""
+*
+*   The 'numpy' backend can only read WDM files.  Use the 'fortran'
+*   backend to change a WDM file.
+*
+""")
 
     def wmsgop(self):
         """WMSGOP is a simple open of the message file."""
-        afilename = os.path.join(sys.prefix,
-                                 'share',
-                                 'wdmtoolbox',
-                                 'message.wdm')
-        return self._open(afilename, 50, ronwfg=1)
+        return self._open(_message_file(), ronwfg=1)
 
     def dateconverter(self, datestr):
         """Extract and convert dates.
@@ -158,16 +325,53 @@ class WDM(object):
         Extract all of the grouped numbers out of a string
         to create an array suitable for dates and times.
         """
+        import pandas as pd
         words = re.findall(r'\d+', str(datestr))
         words = [int(i) for i in words]
         dtime = [1900, 1, 1, 0, 0, 0]
         dtime[:len(words)] = words
         return pd.np.array(dtime)
 
-    def _open(self, wdname, wdmsfl, ronwfg=0):
-        """Private method to open WDM file."""
-        wdname = wdname.strip()
-        if wdname not in self.openfiles:
+    def _library_lock(self):
+        """Return the lock to hold around calls that open a WDM file.
+
+        The 'numpy' backend reads through its own memory map of each file,
+        so reads of different files run at the same time.
+        """
+        if self.backend == 'numpy':
+            return _NOLOCK
+        return self.lock
+
+    @contextlib.contextmanager
+    def _file_lock(self, *wdmpaths):
+        """Hold the locks of the WDM files, always taken in the same order."""
+        with self.lock:
+            locks = [self.file_locks.setdefault(i, threading.RLock())
+                     for i in sorted(set(_abspath(j) for j in wdmpaths))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _open(self, wdname, ronwfg=0):
+        """Private method to open WDM file.
+
+        The WDM library can only have MXWDM files open, and one place is
+        kept for the message file.  With the 'fortran' backend, when the
+        other places are taken by files left open by keep_open or sessions,
+        the least recently used file that no session holds is closed first.
+        """
+        wdname = _abspath(wdname)
+        if wdname in self.openfiles:
+            # Move to the most recently used end.
+            self.openfiles[wdname] = self.openfiles.pop(wdname)
+        else:
+            if self.backend == 'fortran':
+                self._make_room(wdname)
+            wdmsfl = self._next_unit()
             if ronwfg == 1:
                 if not os.path.exists(wdname):
                     raise ValueError("""
@@ -177,12 +381,81 @@ class WDM(object):
 *   in read-only mode and it cannot be found.
 *
     """.format(wdname))
-            retcode = self.wdbopn(wdmsfl,
-                                  wdname,
-                                  ronwfg)
-            self._retcode_check(retcode, additional_info='wdbopn')
+            if self.backend == 'numpy':
+                if ronwfg == 2:
+                    self._read_only()
+                # The WDMFile takes the place of the Fortran unit number.
+                wdmsfl = self.wdbopn(wdname, ronwfg)
+            else:
+                retcode = self.wdbopn(wdmsfl,
+                                      wdname,
+                                      ronwfg)
+                self._retcode_check(retcode, additional_info='wdbopn')
             self.openfiles[wdname] = wdmsfl
-        return wdmsfl
+            self.openstamps[wdname] = _stamp(wdname)
+        return self.openfiles[wdname]
+
+    def _make_room(self, wdname):
+        """Close the least recently used files before wdname is opened."""
+        message = _abspath(_message_file())
+        if wdname == message:
+            return
+        opened = [i for i in self.openfiles if i != message]
+        idle = [i for i in opened if i not in self.sessions]
+        while len(opened) >= MXWDM - 1 and idle:
+            self._close(idle[0], force=True)
+            opened.remove(idle.pop(0))
+
+    def _next_unit(self):
+        """Return a Fortran unit number not used by any open file."""
+        inuse = set(self.openfiles.values())
+        # The WDM library writes messages to unit 99.
+        for unit in range(50, 99):
+            if unit not in inuse:
+                return unit
+        raise WDMError("""
+*
+*   No free Fortran unit numbers are available to open another file.
+*
+""")
+
+    @contextlib.contextmanager
+    def session(self, wdmpath, mode='r'):
+        """Keep wdmpath open for all WDM calls made inside the context.
+
+        Every method that takes `wdmpath` will use the already open file
+        instead of opening and closing it, which also keeps the WDM record
+        buffer warm between calls.  The `mode` is 'r' for read-only or 'w'
+        for read/write of an existing file.  Sessions can be nested.
+
+            with wdm.session('file.wdm') as wdmpath:
+                for dsn in wdm.list_dsns(wdmpath):
+                    wdm.read_dsn(wdmpath, dsn)
+        """
+        try:
+            ronwfg = {'r': 1, 'w': 0}[mode]
+        except KeyError:
+            raise ValueError("""
+*
+*   The session mode must be 'r' or 'w', not '{0}'.
+*
+""".format(mode))
+        wdmpath = wdmpath.strip()
+        key = _abspath(wdmpath)
+        with self._file_lock(wdmpath):
+            with self.lock:
+                if key not in self.sessions:
+                    self._open(wdmpath, ronwfg=ronwfg)
+                    self.sessions[key] = 0
+                self.sessions[key] = self.sessions[key] + 1
+            try:
+                yield wdmpath
+            finally:
+                with self.lock:
+                    self.sessions[key] = self.sessions[key] - 1
+                    if self.sessions[key] == 0:
+                        self.sessions.pop(key)
+                        self._close(wdmpath)
 
     def _retcode_check(self, retcode, additional_info=' '):
         """Central place to run through the return code."""
@@ -261,9 +534,7 @@ class WDM(object):
             }
 
         if retcode in retcode_dict:
-            lopenfiles = self.openfiles.copy()
-            for fn in lopenfiles:
-                self._close(fn)
+            self._close_after_error()
             raise WDMError("""
 *
 *   WDM library function returned error code {0}. {1}
@@ -271,20 +542,35 @@ class WDM(object):
 *
 """.format(retcode, additional_info, retcode_dict[retcode]))
         if retcode != 0:
-            for fn in self.openfiles:
-                self._close(fn)
+            self._close_after_error()
             raise WDMError("""
 *
 *   WDM library function returned error code {0}. {1}
 *
 """.format(retcode, additional_info))
 
+    def _close_after_error(self):
+        """Close the open files after an error from the WDM library.
+
+        The WDM library may be left in a bad state, so every file is
+        closed.  The 'numpy' backend keeps no state between calls, and
+        other threads can be reading their own files, so it closes none.
+        """
+        if self.backend == 'numpy':
+            return
+        lopenfiles = self.openfiles.copy()
+        for fn in lopenfiles:
+            self._close(fn, force=True)
+
+    @_locked
     def renumber_dsn(self, wdmpath, odsn, ndsn):
         """Will renumber the odsn to the ndsn."""
         odsn = int(odsn)
         ndsn = int(ndsn)
+        self._changed(wdmpath, odsn)
+        self._changed(wdmpath, ndsn)
 
-        wdmfp = self._open(wdmpath, 51)
+        wdmfp = self._open(wdmpath)
         retcode = self.wddsrn(
             wdmfp,
             odsn,
@@ -292,15 +578,17 @@ class WDM(object):
         self._close(wdmpath)
         self._retcode_check(retcode, additional_info='wddsrn')
 
+    @_locked
     def delete_dsn(self, wdmpath, dsn):
         """Function to delete a DSN."""
         dsn = int(dsn)
+        self._changed(wdmpath, dsn)
 
-        wdmfp = self._open(wdmpath, 52)
+        wdmfp = self._open(wdmpath)
         testreturn = self.wdckdt(wdmfp, dsn)
         self._close(wdmpath)
         if testreturn != 0:
-            wdmfp = self._open(wdmpath, 52)
+            wdmfp = self._open(wdmpath)
             retcode = self.wddsdl(wdmfp,
                                   dsn)
             self._close(wdmpath)
@@ -308,61 +596,231 @@ class WDM(object):
         self._close(wdmpath)
 
     def copydsnlabel(self, inwdmpath, indsn, outwdmpath, outdsn):
-        """Will copy a complete DSN label from one DSN to another."""
-        assert inwdmpath != outwdmpath
+        """Will copy a complete DSN label from one DSN to another.
+
+        The DSNs can be in the same WDM file.
+        """
         indsn = int(indsn)
         outdsn = int(outdsn)
         dsntype = 0
-        inwdmfp = self._open(inwdmpath, 53, ronwfg=1)
-        outwdmfp = self._open(outwdmpath, 54)
-        retcode = self.wddscl(inwdmfp,
-                              indsn,
-                              outwdmfp,
-                              outdsn,
-                              dsntype)
-        self._close(inwdmpath)
-        self._close(outwdmpath)
-        self._retcode_check(retcode, additional_info='wddscl')
+        same = _same_file(inwdmpath, outwdmpath)
+        if same:
+            outwdmpath = inwdmpath
+        with self._file_lock(inwdmpath, outwdmpath), self.lock:
+            self._changed(outwdmpath, outdsn)
+            inwdmfp = self._open(inwdmpath, ronwfg=0 if same else 1)
+            outwdmfp = self._open(outwdmpath)
+            retcode = self.wddscl(inwdmfp,
+                                  indsn,
+                                  outwdmfp,
+                                  outdsn,
+                                  dsntype)
+            self._close(inwdmpath)
+            self._close(outwdmpath)
+            self._retcode_check(retcode, additional_info='wddscl')
+
+    def copy_dsn_data(self, inwdmpath, indsn, outwdmpath, outdsn,
+                      start_date=None):
+        """Copy the time-series data of indsn to outdsn a group at a time.
+
+        The values go from wdtget to wdtput as they are, without building
+        a DataFrame, while both WDM files are held open.  The DSNs can be in
+        the same WDM file.  The outdsn must already have a label with the
+        same time step.  With `start_date`, a datetime.datetime, only the
+        values from start_date on are copied.  Returns the number of values
+        copied.
+        """
+        indsn = int(indsn)
+        outdsn = int(outdsn)
+        inmode = 'r'
+        if _same_file(inwdmpath, outwdmpath):
+            inwdmpath = outwdmpath
+            inmode = 'w'
+        with self._file_lock(inwdmpath, outwdmpath), \
+                self.session(outwdmpath, mode='w'), \
+                self.session(inwdmpath, mode=inmode):
+            desc_dsn = self.describe_dsn(inwdmpath, indsn)
+            if desc_dsn['start_date'] is None:
+                return 0
+            tcode = desc_dsn['tcode']
+            tstep = desc_dsn['tstep']
+            lledat = datetime.datetime(*desc_dsn['lledat'])
+            sdat = desc_dsn['llsdat']
+            if start_date is not None:
+                if start_date >= lledat:
+                    return 0
+                sdat, _ = self._date_window(desc_dsn['llsdat'],
+                                            desc_dsn['lledat'],
+                                            tcode,
+                                            tstep,
+                                            start_date=start_date)
+
+            self._changed(outwdmpath, outdsn)
+            inwdmfp = self._open(inwdmpath, ronwfg=1)
+            with self._library_lock():
+                tgroup, retcode = self.wdbsgi(inwdmfp, indsn, 34, 1)
+            # retcode = -107 if attribute not present
+            tgroup = tgroup[0] if retcode == 0 else 6
+            outwdmfp = self._open(outwdmpath)
+
+            nvalues = 0
+            while datetime.datetime(*sdat) < lledat:
+                # The start of the next group.
+                edat = self._timadd(self._tcode_date(tgroup, sdat),
+                                    tgroup,
+                                    1,
+                                    1)
+                if datetime.datetime(*edat) > lledat:
+                    edat = desc_dsn['lledat']
+                nval = self.timdif(sdat, edat, tcode, tstep)
+                if nval <= 0:
+                    break
+                dataout = self._wdtget(inwdmpath, indsn, sdat, nval, tcode,
+                                       tstep)
+                with self.lock:
+                    retcode = self.wdtput(
+                        outwdmfp,
+                        outdsn,
+                        tstep,
+                        sdat,
+                        nval,
+                        1,
+                        0,
+                        tcode,
+                        dataout)
+                    self._retcode_check(retcode, additional_info='wdtput')
+                nvalues = nvalues + nval
+                sdat = self._timadd(sdat, tcode, tstep, nval)
+        return nvalues
+
+    @_locked
+    def list_dsns(self, wdmpath):
+        """Return a sorted list of the DSNs that exist in the WDM file.
+
+        Walks the directory records with WDDSNX instead of probing every
+        possible DSN number.
+        """
+        wdmfp = self._open(wdmpath, ronwfg=1)
+        dsns = []
+        dsn = 1
+        while 1 <= dsn <= 32000:
+            # WDDSNX returns the first existing DSN >= dsn, or -1 if none.
+            dsn = self.wddsnx(wdmfp, dsn)
+            if dsn == -1:
+                break
+            dsns.append(dsn)
+            dsn = dsn + 1
+        self._close(wdmpath)
+        return dsns
 
+    @_locked
     def describe_dsn(self, wdmpath, dsn):
         """Will collect some metadata about the DSN."""
-        wdmfp = self._open(wdmpath, 55)
+        dsn = int(dsn)
+        labels = self._labels(wdmpath)
+        if dsn not in labels['descs']:
+            wdmfp = self._open(wdmpath)
+            labels['descs'][dsn] = self._describe_dsn(wdmfp, dsn)
+            self._close(wdmpath)
+        return copy.deepcopy(labels['descs'][dsn])
+
+    @_locked
+    def describe_dsns(self, wdmpath, dsns=None):
+        """Collect the metadata for several DSNs with a single file open.
+
+        Returns a dictionary keyed by DSN.  If `dsns` is None, all of the
+        time-series DSNs in the WDM file are described.
+        """
+        labels = self._labels(wdmpath)
+        if dsns is None:
+            if labels['dsns'] is None:
+                dsns = self.list_dsns(wdmpath)
+                wdmfp = self._open(wdmpath)
+                # Only time-series data sets (DSTYPE=1) have these
+                # attributes.
+                labels['dsns'] = [i for i in dsns
+                                  if self.wdckdt(wdmfp, i) == 1]
+                self._close(wdmpath)
+            dsns = labels['dsns']
+        dsns = [int(i) for i in dsns]
+        missing = [i for i in dsns if i not in labels['descs']]
+        if missing:
+            wdmfp = self._open(wdmpath)
+            for dsn in missing:
+                labels['descs'][dsn] = self._describe_dsn(wdmfp, dsn)
+            self._close(wdmpath)
+        return dict((dsn, copy.deepcopy(labels['descs'][dsn]))
+                    for dsn in dsns)
+
+    def _labels(self, wdmpath):
+        """Return the cached labels of wdmpath.
+
+        A dictionary with 'descs', the describe_dsn results keyed by DSN,
+        and 'dsns', the list of time-series DSNs or None if not yet known.
+        The methods that change the file drop what they change with
+        _changed, and changes made outside of this WDM instance start the
+        cache over when the inode, modification time, or size of the file
+        is different.
+        """
+        wdmpath = _abspath(wdmpath)
+        stamp = _stamp(wdmpath)
+        with self.lock:
+            labels = self.labels.get(wdmpath)
+            if labels is None or labels['stamp'] != stamp:
+                labels = {'stamp': stamp, 'descs': {}, 'dsns': None}
+                self.labels[wdmpath] = labels
+            return labels
+
+    def _changed(self, wdmpath, dsn=None):
+        """Drop the cached labels and read_dsn results of dsn in wdmpath.
+
+        With `dsn` of None everything cached for wdmpath is dropped.
+        """
+        with self.lock:
+            self.cache_clear(wdmpath, dsn)
+            labels = self.labels.get(_abspath(wdmpath))
+            if labels is not None:
+                labels['dsns'] = None
+                if dsn is None:
+                    labels['descs'].clear()
+                else:
+                    labels['descs'].pop(int(dsn), None)
+
+    def _describe_dsn(self, wdmfp, dsn):
+        """Read the label attributes of DSN from the already open wdmfp.
+
+        All of the attributes are on the same label record, so after the
+        first call the record is served from the WDM buffer.
+        """
         _, llsdat, lledat, retcode = self.wtfndt(
             wdmfp,
             dsn,
             1)  # GPFLG  - get(1)/put(2) flag
-        self._close(wdmpath)
         # Ignore retcode == -6 which means that the dsn doesn't have any data.
         # It it is a new dsn, of course it doesn't have any data.
         if retcode == -6:
             retcode = 0
         self._retcode_check(retcode, additional_info='wtfndt')
 
-        wdmfp = self._open(wdmpath, 55)
-        tstep, retcode = self.wdbsgi(
-            wdmfp,
-            dsn,
-            33,  # saind = 33 for time step
-            1)   # salen
-        self._close(wdmpath)
-        self._retcode_check(retcode, additional_info='wdbsgi')
-
-        wdmfp = self._open(wdmpath, 55)
-        tcode, retcode = self.wdbsgi(
-            wdmfp,
-            dsn,
-            17,  # saind = 17 for time code
-            1)   # salen
-        self._close(wdmpath)
-        self._retcode_check(retcode, additional_info='wdbsgi')
+        # saind = 33 for time step, 17 for time code, 27 for base_year
+        ivals = {}
+        for saind in [33, 17, 27]:
+            ival, retcode = self.wdbsgi(
+                wdmfp,
+                dsn,
+                saind,
+                1)   # salen
+            self._retcode_check(retcode, additional_info='wdbsgi')
+            ivals[saind] = ival[0]
+        tstep = ivals[33]
+        tcode = ivals[17]
+        base_year = ivals[27]
 
-        wdmfp = self._open(wdmpath, 55)
         tsfill, retcode = self.wdbsgr(
             wdmfp,
             dsn,
             32,  # saind = 32 for tsfill
             1)   # salen
-        self._close(wdmpath)
         # retcode = -107 if attribute not present
         if retcode == -107:
             # Since I use tsfill if not found will set to default.
@@ -372,62 +830,24 @@ class WDM(object):
             tsfill = tsfill[0]
         self._retcode_check(retcode, additional_info='wdbsgr')
 
-        wdmfp = self._open(wdmpath, 55)
-        ostr, retcode = self.wdbsgc(
-            wdmfp,
-            dsn,
-            290,    # saind = 290 for location
-            8)      # salen
-        self._close(wdmpath)
-        if retcode == -107:
-            ostr = ''
-            retcode = 0
-        self._retcode_check(retcode, additional_info='wdbsgr')
-
-        wdmfp = self._open(wdmpath, 55)
-        scen_ostr, retcode = self.wdbsgc(
-            wdmfp,
-            dsn,
-            288,    # saind = 288 for scenario
-            8)      # salen
-        self._close(wdmpath)
-        if retcode == -107:
-            scen_ostr = ''
-            retcode = 0
-        self._retcode_check(retcode, additional_info='wdbsgr')
-
-        wdmfp = self._open(wdmpath, 55)
-        con_ostr, retcode = self.wdbsgc(
-            wdmfp,
-            dsn,
-            289,    # saind = 289 for constitiuent
-            8)      # salen
-        self._close(wdmpath)
-        if retcode == -107:
-            con_ostr = ''
-            retcode = 0
-        self._retcode_check(retcode, additional_info='wdbsgr')
-
-        wdmfp = self._open(wdmpath, 55)
-        base_year, retcode = self.wdbsgi(
-            wdmfp,
-            dsn,
-            27,  # saind = 27 for base_year
-            1)   # salen
-        self._close(wdmpath)
-        self._retcode_check(retcode, additional_info='wdbsgi')
-
-        wdmfp = self._open(wdmpath, 55)
-        desc_ostr, retcode = self.wdbsgc(
-            wdmfp,
-            dsn,
-            45,      # saind = 45 for description
-            48)      # salen
-        self._close(wdmpath)
-        if retcode == -107:
-            desc_ostr = ''
-            retcode = 0
-        self._retcode_check(retcode, additional_info='wdbsgr')
+        # saind = 290 for location, 288 for scenario, 289 for constituent,
+        # 45 for description
+        cvals = {}
+        for saind, salen in [(290, 8), (288, 8), (289, 8), (45, 48)]:
+            ostr, retcode = self.wdbsgc(
+                wdmfp,
+                dsn,
+                saind,
+                salen)
+            if retcode == -107:
+                ostr = ''
+                retcode = 0
+            self._retcode_check(retcode, additional_info='wdbsgc')
+            try:
+                ostr = str(ostr, "utf-8").strip()
+            except TypeError:
+                ostr = ''.join(ostr).strip()
+            cvals[saind] = ostr
 
         self.timcvt(llsdat)
         self.timcvt(lledat)
@@ -440,21 +860,6 @@ class WDM(object):
         except ValueError:
             edate = None
 
-        tstep = tstep[0]
-        tcode = tcode[0]
-        base_year = base_year[0]
-
-        try:
-            ostr = str(ostr, "utf-8").strip()
-            scen_ostr = str(scen_ostr, "utf-8").strip()
-            con_ostr = str(con_ostr, "utf-8").strip()
-            desc_ostr = str(desc_ostr, "utf-8").strip()
-        except TypeError:
-            ostr = ''.join(ostr).strip()
-            scen_ostr = ''.join(scen_ostr).strip()
-            con_ostr = ''.join(con_ostr).strip()
-            desc_ostr = ''.join(desc_ostr).strip()
-
         return {'dsn':         dsn,
                 'start_date':  sdate,
                 'end_date':    edate,
@@ -463,39 +868,150 @@ class WDM(object):
                 'tstep':       tstep,
                 'tcode':       tcode,
                 'tcode_name':  MAPTCODE[tcode],
-                'location':    ostr.strip(),
-                'scenario':    scen_ostr.strip(),
-                'constituent': con_ostr.strip(),
+                'location':    cvals[290],
+                'scenario':    cvals[288],
+                'constituent': cvals[289],
                 'tsfill':      tsfill,
-                'description': desc_ostr,
+                'description': cvals[45],
                 'base_year':   base_year}
 
+    @_locked
     def create_new_wdm(self, wdmpath, overwrite=False):
         """Create a new WDM fileronwfg."""
+        self._changed(wdmpath)
         if overwrite and os.path.exists(wdmpath):
-            self._close(wdmpath)
+            self._close(wdmpath, force=True)
             os.remove(wdmpath)
         elif os.path.exists(wdmpath):
             raise WDMFileExists(wdmpath)
         ronwfg = 2
-        self._open(wdmpath, 56, ronwfg=ronwfg)
+        self._open(wdmpath, ronwfg=ronwfg)
         self._close(wdmpath)
 
     def set_dsn_attribute(self, wdmpath, dsn, attribute=None):
         """Set DSN attributes."""
         pass
 
+    @_locked
     def create_new_dsn(self, wdmpath, dsn, tstype='', base_year=1900, tcode=4,
                        tsstep=1, statid=' ', scenario='', location='',
                        description='', constituent='', tsfill=-999.0):
         """Create self.wdmfp/dsn."""
-        wdmfp = self._open(wdmpath, 57)
+        self._changed(wdmpath, dsn)
+        wdmfp = self._open(wdmpath)
         messfp = self.wmsgop()
 
         if self.wdckdt(wdmfp, dsn) == 1:
             self._close(wdmpath)
             raise DSNExistsError(dsn)
 
+        try:
+            attributes = self._dsn_attributes(tstype=tstype,
+                                              base_year=base_year,
+                                              tcode=tcode,
+                                              tsstep=tsstep,
+                                              statid=statid,
+                                              scenario=scenario,
+                                              location=location,
+                                              description=description,
+                                              constituent=constituent,
+                                              tsfill=tsfill)
+        except ValueError:
+            self._close(wdmpath)
+            raise
+        self._create_dsn(wdmfp, messfp, dsn, attributes)
+        self._close(wdmpath)
+
+    @_locked
+    def create_many_dsns(self, wdmpath, records):
+        """Create a DSN for each record, holding the WDM file open.
+
+        Each record is a dictionary with the 'dsn' and any of the keywords
+        of create_new_dsn.  A record that cannot be created does not stop
+        the others.  Returns a list of [position, dsn, message] for each
+        record that was not created.
+        """
+        errors = []
+        self._changed(wdmpath)
+        with self.session(wdmpath, mode='w'):
+            wdmfp = self._open(wdmpath)
+            for position, record in enumerate(records):
+                # wmsgop only opens the message file again if an error
+                # closed it.
+                messfp = self.wmsgop()
+                record = dict(record)
+                dsn = record.pop('dsn', None)
+                try:
+                    if dsn is None:
+                        raise KeyError('The record does not have a DSN.')
+                    dsn = int(dsn)
+                    if dsn < 1 or dsn > 32000:
+                        raise DSNDoesNotExist(dsn)
+                    attributes = self._dsn_attributes(**record)
+                    if self.wdckdt(wdmfp, dsn) == 1:
+                        raise DSNExistsError(dsn)
+                    self._create_dsn(wdmfp, messfp, dsn, attributes)
+                except (KeyError, TypeError, ValueError, DSNDoesNotExist,
+                        DSNExistsError, WDMError) as err:
+                    message = str(err.args[0] if isinstance(err, KeyError)
+                                  else err)
+                    message = ' '.join(message.replace('*', ' ').split())
+                    errors.append([position, dsn, message])
+        return errors
+
+    def _dsn_attributes(self, tstype='', base_year=1900, tcode=4, tsstep=1,
+                        statid=' ', scenario='', location='', description='',
+                        constituent='', tsfill=-999.0):
+        """Check and collect the attributes of a new DSN.
+
+        Returns the integer, real, and character attributes as lists of
+        [saind, salen, saval].
+        """
+        ivals = [(34, 1, 6),  # tgroup
+                 (83, 1, 1),  # compfg
+                 (84, 1, 1),  # tsform
+                 (85, 1, 1),  # vbtime
+                 (17, 1, int(tcode)),  # tcode
+                 (33, 1, int(tsstep)),  # tsstep
+                 (27, 1, int(base_year)),  # tsbyr
+                ]
+
+        if int(tcode) not in MAPTCODE:
+            raise ValueError("""
+*
+*   The tcode must be one of 1 (second), 2 (minute), 3 (hour), 4 (day),
+*   5 (month), or 6 (year).  You gave {0}.
+*
+""".format(tcode))
+
+        rvals = [(32, 1, float(tsfill))]  # tsfill
+
+        cvals = []
+        for saind, salen, saval, error_name in [
+                (2, 16, str(statid), 'Station ID'),
+                (1, 4, str(tstype).upper(), 'Time series type - tstype'),
+                (45, 48, str(description).upper(), 'Description'),
+                (288, 8, str(scenario).upper(), 'Scenario'),
+                (289, 8, str(constituent).upper(), 'Constituent'),
+                (290, 8, str(location).upper(), 'Location'),
+                ]:
+            saval = saval.strip()
+            if len(saval) > salen:
+                raise ValueError("""
+*
+*   String "{0}" is too long for {1}.  Must
+*   have a length equal or less than {2}.
+*
+""".format(saval, error_name, salen))
+
+            saval = '{0: <{1}}'.format(saval, salen)
+            cvals.append((saind, salen, saval))
+        return ivals, rvals, cvals
+
+    def _create_dsn(self, wdmfp, messfp, dsn, attributes):
+        """Create the label of a DSN and set the attributes."""
+        ivals, rvals, cvals = attributes
+
         # Parameters for wdlbax taken from ATCTSfile/clsTSerWDM.cls
         self.wdlbax(
             wdmfp,
@@ -508,14 +1024,7 @@ class WDM(object):
             300,   # NDP    - number of data pointers
             )      # PSA    - pointer to search attribute space
 
-        for saind, salen, saval in [(34, 1, 6),  # tgroup
-                                    (83, 1, 1),  # compfg
-                                    (84, 1, 1),  # tsform
-                                    (85, 1, 1),  # vbtime
-                                    (17, 1, int(tcode)),  # tcode
-                                    (33, 1, int(tsstep)),  # tsstep
-                                    (27, 1, int(base_year)),  # tsbyr
-                                   ]:
+        for saind, salen, saval in ivals:
             retcode = self.wdbsai(
                 wdmfp,
                 dsn,
@@ -525,7 +1034,7 @@ class WDM(object):
                 saval)
             self._retcode_check(retcode, additional_info='wdbsai')
 
-        for saind, salen, saval in [(32, 1, tsfill)]:  # tsfill
+        for saind, salen, saval in rvals:
             retcode = self.wdbsar(
                 wdmfp,
                 dsn,
@@ -535,25 +1044,7 @@ class WDM(object):
                 saval)
             self._retcode_check(retcode, additional_info='wdbsar')
 
-        for saind, salen, saval, error_name in [
-                (2, 16, statid, 'Station ID'),
-                (1, 4, tstype.upper(), 'Time series type - tstype'),
-                (45, 48, description.upper(), 'Description'),
-                (288, 8, scenario.upper(), 'Scenario'),
-                (289, 8, constituent.upper(), 'Constituent'),
-                (290, 8, location.upper(), 'Location'),
-                ]:
-            saval = saval.strip()
-            if len(saval) > salen:
-                raise ValueError("""
-*
-*   String "{0}" is too long for {1}.  Must
-*   have a length equal or less than {2}.
-*
-""".format(saval, error_name, salen))
-
-            saval = '{0: <{1}}'.format(saval, salen)
-
+        for saind, salen, saval in cvals:
             retcode = self.wdbsac(
                 wdmfp,
                 dsn,
@@ -562,7 +1053,6 @@ class WDM(object):
                 salen,
                 saval)
             self._retcode_check(retcode, additional_info='wdbsac')
-        self._close(wdmpath)
 
     def _tcode_date(self, tcode, date):
         """Use tcode to set the significant parts of the date tuple."""
@@ -581,9 +1071,205 @@ class WDM(object):
             rdate[5] = date[5]
         return rdate
 
-    def write_dsn(self, wdmpath, dsn, data):
-        """Write to self.wdmfp/dsn the time-series data."""
+    @_locked
+    def write_dsn(self, wdmpath, dsn, data, overwrite=False):
+        """Write to self.wdmfp/dsn the time-series data.
+
+        The WDM library deletes all of the data in the DSN from the start
+        of `data` onward before writing it.  With `overwrite` set to True
+        only the time steps covered by `data` are replaced.  The data after
+        them is read and written back after `data`, so correcting a window
+        near the end of a DSN only rewrites from the window to the end.
+        """
+        dsn_desc = self.describe_dsn(wdmpath, dsn)
+        if overwrite is True and dsn_desc['start_date'] is not None:
+            data = self._with_following(wdmpath, dsn, dsn_desc, data)
+        self._write_dsn(wdmpath, dsn, dsn_desc, data)
+
+    def write_many(self, wdmpath, data, overwrite=False):
+        """Write many time-series to the WDM file in one session.
+
+        The `data` is a dictionary of DSN to a DataFrame or Series, each
+        written with write_dsn.
+        """
+        import pandas as pd
+        with self.session(wdmpath, mode='w'):
+            for dsn in sorted(data):
+                tsd = data[dsn]
+                if isinstance(tsd, pd.Series):
+                    tsd = tsd.to_frame()
+                self.write_dsn(wdmpath, int(dsn), tsd, overwrite=overwrite)
+
+    def write_chunks(self, wdmpath, dsn, chunks, append=False,
+                     overwrite=False):
+        """Write an iterable of DataFrames one after another to the DSN.
+
+        The WDM file is held open for all of the writes.  Each chunk must
+        be in time order, start after the end of the chunk before, and be
+        at the interval of the DSN.  Gaps between and within chunks are
+        written as missing.  With `append` the rows up to the end of the
+        data in the DSN are skipped, as in append_dsn.  With `overwrite`
+        the data in the DSN after the last chunk is kept.  Before the first
+        chunk is written that data is copied a group at a time to a spare
+        DSN in the same file, and after the last chunk it is copied back,
+        so it is never all in memory.
+        """
+        import pandas as pd
+        dsn = int(dsn)
+        with self.session(wdmpath, mode='w'):
+            dsn_desc = self.describe_dsn(wdmpath, dsn)
+            freq = self._freq(dsn_desc['tcode'], dsn_desc['tstep'])
+            offset = pd.tseries.frequencies.to_offset(freq)
+            following = None
+            spare = None
+            try:
+                for chunk in chunks:
+                    if len(chunk) == 0:
+                        continue
+                    if (not chunk.index.is_monotonic_increasing or
+                            not chunk.index.is_unique):
+                        raise ValueError("""
+*
+*   The data must be in time order without repeated times.  The chunk that
+*   starts at {0} is not.
+*
+""".format(chunk.index[0]))
+
+                    start = chunk.index[0] if following is None else following
+                    if chunk.index[0] < start:
+                        raise ValueError("""
+*
+*   The chunk that starts at {0} overlaps the data written before it,
+*   which ended at {1}.
+*
+""".format(chunk.index[0], start - offset))
+
+                    index = pd.date_range(start, chunk.index[-1], freq=freq)
+                    if not chunk.index.isin(index).all():
+                        raise ValueError("""
+*
+*   The chunk that starts at {0} is not at the interval of the DSN, {1},
+*   continuing from {2}.
+*
+""".format(chunk.index[0], freq, start))
+                    chunk = chunk.reindex(index)
+
+                    if append is True:
+                        self.append_dsn(wdmpath, dsn, chunk)
+                    else:
+                        if (overwrite is True and following is None and
+                                dsn_desc['start_date'] is not None):
+                            spare = self._spare_copy(wdmpath, dsn,
+                                                     index[-1] + offset)
+                        self.write_dsn(wdmpath, dsn, chunk)
+                    following = index[-1] + offset
+            finally:
+                if spare is not None:
+                    # Also put the data back when a chunk fails.
+                    try:
+                        if following is not None:
+                            self.copy_dsn_data(wdmpath, spare, wdmpath, dsn,
+                                               start_date=_naive(following))
+                    finally:
+                        self.delete_dsn(wdmpath, spare)
+
+    def _spare_copy(self, wdmpath, dsn, start_date):
+        """Copy the data of the DSN from start_date on to a spare DSN.
+
+        The spare DSN is the highest unused DSN number in wdmpath, with a
+        copy of the label of dsn.  Returns the spare DSN.
+        """
+        dsns = set(self.list_dsns(wdmpath))
+        spare = [i for i in range(32000, 0, -1) if i not in dsns][0]
+        self.copydsnlabel(wdmpath, dsn, wdmpath, spare)
+        self.copy_dsn_data(wdmpath, dsn, wdmpath, spare,
+                           start_date=_naive(start_date))
+        return spare
+
+    def _with_following(self, wdmpath, dsn, dsn_desc, data):
+        """Return data followed by the values in the DSN after its end."""
+        import pandas as pd
+        tcode = dsn_desc['tcode']
+        tstep = dsn_desc['tstep']
+        index = data.index
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        following = self._timadd(self._tcode_date(tcode,
+                                                  index[-1].timetuple()[:6]),
+                                 tcode,
+                                 tstep,
+                                 1)
+        sdat, nval = self._date_window(dsn_desc['llsdat'],
+                                       dsn_desc['lledat'],
+                                       tcode,
+                                       tstep,
+                                       start_date=datetime.datetime(
+                                           *following))
+        if nval == 0:
+            return data
+        dataout = self._wdtget(wdmpath, dsn, sdat, nval, tcode, tstep)
+        # Leave off the missing values that pad the last group.
+        found = pd.np.flatnonzero(dataout != dsn_desc['tsfill'])
+        if len(found) == 0:
+            return data
+        dataout = dataout[:found[-1] + 1]
+        freq = self._freq(tcode, tstep)
+        following = pd.DataFrame(dataout.astype('float64'),
+                                 index=pd.date_range(
+                                     datetime.datetime(*sdat),
+                                     periods=len(dataout),
+                                     freq=freq),
+                                 columns=data.columns)
+        data = data.copy()
+        data.index = index
+        # _write_dsn writes the values one after another, so the time
+        # steps between data and a DSN that starts after it are filled
+        # with missing values.
+        gap = pd.date_range(index[-1], following.index[0], freq=freq)[1:-1]
+        gap = pd.DataFrame(pd.np.nan, index=gap, columns=data.columns)
+        return pd.concat([data, gap, following])
+
+    @_locked
+    def append_dsn(self, wdmpath, dsn, data):
+        """Write the rows of data that come after the data in the DSN.
+
+        Rows up to the last value already in the DSN are skipped, so only
+        the new rows are written.  The rows must be in time order and at
+        the interval of the DSN.  Returns the number of rows written.
+        """
+        import pandas as pd
         dsn_desc = self.describe_dsn(wdmpath, dsn)
+        if dsn_desc['start_date'] is not None and len(data) > 0:
+            index = data.index
+            if index.tz is not None:
+                index = index.tz_localize(None)
+            tcode = dsn_desc['tcode']
+            tstep = dsn_desc['tstep']
+            # The WDM library pads the last group with missing values, so
+            # lledat can be past the last value.  Read from the first new
+            # row to the end of the DSN to find it, since wdtput deletes
+            # everything after the first row that is written.
+            sdat, nval = self._date_window(dsn_desc['llsdat'],
+                                           dsn_desc['lledat'],
+                                           tcode,
+                                           tstep,
+                                           start_date=index[0])
+            if nval > 0:
+                dataout = self._wdtget(wdmpath, dsn, sdat, nval, tcode,
+                                       tstep)
+                found = pd.np.flatnonzero(dataout != dsn_desc['tsfill'])
+                if len(found) > 0:
+                    end = self._timadd(sdat, tcode, tstep, found[-1] + 1)
+                    data = data.iloc[index.searchsorted(
+                        datetime.datetime(*end)):].copy()
+        if len(data) == 0:
+            return 0
+        self._write_dsn(wdmpath, dsn, dsn_desc, data)
+        return len(data)
+
+    def _write_dsn(self, wdmpath, dsn, dsn_desc, data):
+        """Write data to the DSN described by dsn_desc."""
+        self._changed(wdmpath, dsn)
         tcode = dsn_desc['tcode']
         tstep = dsn_desc['tstep']
         tsfill = dsn_desc['tsfill']
@@ -602,7 +1288,7 @@ class WDM(object):
 """.format(dsn_desc['base_year'], llsdat[0]))
 
         nval = len(data)
-        wdmfp = self._open(wdmpath, 58)
+        wdmfp = self._open(wdmpath)
         retcode = self.wdtput(
             wdmfp,
             dsn,
@@ -616,23 +1302,89 @@ class WDM(object):
         self._close(wdmpath)
         self._retcode_check(retcode, additional_info='wdtput')
 
-    def read_dsn(self, wdmpath, dsn, start_date=None, end_date=None):
-        """Read from a DSN."""
-        if not os.path.exists(wdmpath):
-            raise ValueError("""
-***
-*** {0} does not exist.
-***
-""".format(wdmpath))
+    def _timadd(self, date, tcode, tstep, nvals):
+        """Add nvals time steps to date, returned with the 00:00 convention."""
+        ndate = self.timadd(date, tcode, tstep, nvals)
+        self.timcvt(ndate)
+        return ndate
+
+    def _steps_to(self, sdat, date, tcode, tstep):
+        """Return the number of time steps from sdat to the first on/after date.
+
+        The `date` is a datetime.datetime.
+        """
+        if date <= datetime.datetime(*sdat):
+            return 0
+        steps = self.timdif(sdat,
+                            date.timetuple()[:6],
+                            tcode,
+                            tstep)
+        # timdif drops the part interval, so step up to date.
+        if datetime.datetime(*self._timadd(sdat,
+                                            tcode,
+                                            tstep,
+                                            steps)) < date:
+            steps = steps + 1
+        return steps
+
+    def _date_window(self, llsdat, lledat, tcode, tstep, start_date=None,
+                     end_date=None):
+        """Find the first date and number of values within the window.
+
+        The window includes the time steps from llsdat that are on or after
+        start_date and on or before end_date.  Returns the WDM date of the
+        first time step in the window and the number of values.
+        """
+        iterm = self.timdif(llsdat,
+                            lledat,
+                            tcode,
+                            tstep)
+
+        sindex = 0
+        if start_date is not None:
+            sindex = self._steps_to(llsdat, start_date, tcode, tstep)
+
+        eindex = iterm
+        if end_date is not None:
+            eindex = min(iterm, self.timdif(llsdat,
+                                            end_date.timetuple()[:6],
+                                            tcode,
+                                            tstep) + 1)
+
+        sdat = self._timadd(llsdat, tcode, tstep, sindex)
+        return sdat, max(eindex - sindex, 0)
+
+    def _read_window(self, wdmpath, dsn, start_date=None, end_date=None,
+                     tcode=None, tstep=None, transform=None):
+        """Work out what wdtget needs to read the requested part of a DSN.
+
+        Returns a dictionary with the 'sdat' and 'nval' of the window, the
+        'tcode', 'tstep', and 'dtran' for wdtget, and the DSN 'tsfill'.
+        """
+        _check_exists(wdmpath)
 
         # Call wdatim_ to get LLSDAT, LLEDAT, TSTEP, TCODE
         desc_dsn = self.describe_dsn(wdmpath, dsn)
 
         llsdat = desc_dsn['llsdat']
         lledat = desc_dsn['lledat']
-        tcode = desc_dsn['tcode']
-        tstep = desc_dsn['tstep']
-        tsfill = desc_dsn['tsfill']
+
+        if tcode is None:
+            tcode = desc_dsn['tcode']
+        tcode = int(tcode)
+        if tstep is None:
+            tstep = 1
+            if tcode == desc_dsn['tcode']:
+                tstep = desc_dsn['tstep']
+        tstep = int(tstep)
+        try:
+            dtran = MAPDTRAN[transform or 'mean']
+        except KeyError:
+            raise ValueError("""
+*
+*   The transform must be one of {0}, not '{1}'.
+*
+""".format(sorted(MAPDTRAN), transform))
 
         # These calls convert 24 to midnight of the next day
         self.timcvt(llsdat)
@@ -660,60 +1412,299 @@ class WDM(object):
 *
 """.format(end_date, datetime.datetime(*llsdat)))
 
-        iterm = self.timdif(llsdat,
-                            lledat,
-                            tcode,
-                            tstep)
-
-        dtran = 0
+        if (tcode, tstep) != (desc_dsn['tcode'], desc_dsn['tstep']):
+            # Count the new time steps from the start of the next larger
+            # time unit so that the intervals line up on the calendar, and
+            # the window below starts on the first complete interval.
+            por_start = datetime.datetime(*llsdat)
+            if start_date is None or start_date < por_start:
+                start_date = por_start
+            llsdat = self._timadd(self._tcode_date(min(tcode + 1, 6), llsdat),
+                                  tcode, tstep, 0)
+
+        sdat, nval = self._date_window(llsdat, lledat, tcode, tstep,
+                                       start_date, end_date)
+        return {'sdat':   sdat,
+                'nval':   nval,
+                'tcode':  tcode,
+                'tstep':  tstep,
+                'dtran':  dtran,
+                'tsfill': desc_dsn['tsfill']}
+
+    @_locked
+    def _wdtget(self, wdmpath, dsn, sdat, nval, tcode, tstep, dtran=0,
+                tsfill=None):
+        """Get nval values starting at sdat as a float32 array.
+
+        Values equal to `tsfill` are set to NaN in place.
+        """
+        import pandas as pd
+        if nval <= 0:
+            return pd.np.array([], dtype=pd.np.float32)
         qualfg = 30
-        # Get the data and put it into dictionary
-        wdmfp = self._open(wdmpath, 59, ronwfg=1)
+        wdmfp = self._open(wdmpath, ronwfg=1)
         dataout, retcode = self.wdtget(
             wdmfp,
             dsn,
             tstep,
-            llsdat,
-            iterm,
+            sdat,
+            nval,
             dtran,
             qualfg,
             tcode)
         self._close(wdmpath)
         self._retcode_check(retcode, additional_info='wdtget')
-
-        index = pd.date_range(datetime.datetime(*llsdat),
-                              periods=iterm,
-                              freq='{0:d}{1}'.format(tstep, MAPTCODE[tcode]))
+        if tsfill is not None:
+            dataout[dataout == tsfill] = pd.np.nan
+        return dataout
+
+    def dsn_name(self, wdmpath, dsn):
+        """Return the column name used for the time-series of a DSN."""
+        return '{0}_DSN_{1}'.format(os.path.basename(wdmpath), dsn)
+
+    def _to_frame(self, wdmpath, dsn, dataout, start, freq):
+        """Convert masked values from wdtget into a DataFrame."""
+        import pandas as pd
+        index = pd.date_range(start,
+                              periods=len(dataout),
+                              freq=freq,
+                              name='Datetime')
 
         # Convert time series to pandas DataFrame
-        tmpval = pd.DataFrame(
-            pd.Series(
-                dataout,
-                index=index,
-                name='{0}_DSN_{1}'.format(
-                    os.path.basename(wdmpath), dsn)), dtype=pd.np.float64)
-
-        tmpval = tsutils.date_slice(tmpval,
-                                    start_date=start_date,
-                                    end_date=end_date)
-        tmpval.replace(tsfill, pd.np.nan, inplace=True)
-        tmpval.index.name = 'Datetime'
-        return tmpval
+        return pd.DataFrame(dataout.astype(pd.np.float64),
+                            index=index,
+                            columns=[self.dsn_name(wdmpath, dsn)])
+
+    def read_dsn(self, wdmpath, dsn, start_date=None, end_date=None,
+                 tcode=None, tstep=None, transform=None):
+        """Read from a DSN.
+
+        If `tcode` or `tstep` are different than the DSN, the WDM library
+        aggregates (or disaggregates) the values during the read using the
+        `transform` of 'mean' (the default), 'sum', 'max', or 'min'.
+        """
+        window = dict(start_date=start_date,
+                      end_date=end_date,
+                      tcode=tcode,
+                      tstep=tstep,
+                      transform=transform)
+        if not self.cache_size:
+            dataout, start, freq = self.read_dsn_array(wdmpath, dsn,
+                                                       **window)
+            return self._to_frame(wdmpath, dsn, dataout, start, freq)
+
+        # Keep other threads from writing between the check of the cache
+        # and the read.
+        with self._file_lock(wdmpath):
+            _check_exists(wdmpath)
+            key = self._cache_key(wdmpath, dsn, window)
+            frame = self._cache_get(key)
+            if frame is None:
+                dataout, start, freq = self.read_dsn_array(wdmpath, dsn,
+                                                           **window)
+                frame = self._to_frame(wdmpath, dsn, dataout, start, freq)
+                self._cache_put(key, frame)
+        # The cached DataFrame is never handed out, so changes made to the
+        # returned one by the caller stay out of the cache.
+        return frame.copy()
+
+    def _cache_key(self, wdmpath, dsn, window):
+        """Return the read_dsn cache key for a DSN and window of wdmpath.
+
+        The inode, modification time, and size of the file are part of the
+        key, so changes made to the file outside of this WDM instance are
+        not hidden by the cache once the file is closed.
+        """
+        wdmpath = _abspath(wdmpath)
+        return ((wdmpath,) + _stamp(wdmpath) + (int(dsn),) +
+                tuple(str(window[i]) for i in sorted(window)))
+
+    def _cache_get(self, key):
+        """Return the cached DataFrame for key, or None."""
+        with self.lock:
+            found = self.cache.pop(key, None)
+            if found is None:
+                self.cache_misses = self.cache_misses + 1
+                return None
+            # Move to the most recently used end.
+            self.cache[key] = found
+            self.cache_hits = self.cache_hits + 1
+            return found[1]
+
+    def _cache_put(self, key, frame):
+        """Add frame to the cache, dropping the least recently used."""
+        nbytes = frame.values.nbytes + frame.index.nbytes
+        with self.lock:
+            if nbytes > self.cache_size:
+                return
+            old = self.cache.pop(key, None)
+            if old is not None:
+                self.cache_bytes = self.cache_bytes - old[0]
+            self.cache[key] = (nbytes, frame)
+            self.cache_bytes = self.cache_bytes + nbytes
+            while self.cache_bytes > self.cache_size:
+                _, (nbytes, _) = self.cache.popitem(last=False)
+                self.cache_bytes = self.cache_bytes - nbytes
+
+    def cache_clear(self, wdmpath=None, dsn=None):
+        """Drop cached read_dsn results.
+
+        Drops everything, or only the results from `wdmpath`, or only those
+        of `dsn` in `wdmpath`.  The methods that change a DSN drop its
+        results themselves.
+        """
+        with self.lock:
+            if wdmpath is None:
+                keys = list(self.cache)
+            else:
+                wdmpath = _abspath(wdmpath)
+                keys = [i for i in self.cache
+                        if i[0] == wdmpath and (dsn is None or
+                                                i[4] == int(dsn))]
+            for key in keys:
+                self.cache_bytes = self.cache_bytes - self.cache.pop(key)[0]
+
+    def cache_info(self):
+        """Return a dictionary of the read_dsn cache statistics.
+
+        The keys are 'hits', 'misses', 'entries', 'bytes' (the size of the
+        cached DataFrames), and 'cache_size'.
+        """
+        with self.lock:
+            return {'hits': self.cache_hits,
+                    'misses': self.cache_misses,
+                    'entries': len(self.cache),
+                    'bytes': self.cache_bytes,
+                    'cache_size': self.cache_size}
+
+    def read_dsn_array(self, wdmpath, dsn, start_date=None, end_date=None,
+                       tcode=None, tstep=None, transform=None):
+        """Read from a DSN without building a DataFrame.
+
+        Takes the same arguments as read_dsn.  Returns the float32 array
+        from wdtget with missing values set to NaN, the datetime of the
+        first value, and the PANDAS frequency string of the values.  The
+        date index is pd.date_range(start, periods=len(values), freq=freq).
+        """
+        # Keep other threads from writing between the two reads.
+        with self._file_lock(wdmpath):
+            window = self._read_window(wdmpath, dsn,
+                                       start_date=start_date,
+                                       end_date=end_date,
+                                       tcode=tcode,
+                                       tstep=tstep,
+                                       transform=transform)
+            dataout = self._wdtget(wdmpath, dsn, window['sdat'],
+                                   window['nval'], window['tcode'],
+                                   window['tstep'], dtran=window['dtran'],
+                                   tsfill=window['tsfill'])
+        return (dataout,
+                datetime.datetime(*window['sdat']),
+                self._freq(window['tcode'], window['tstep']))
+
+    def _freq(self, tcode, tstep):
+        """Return the PANDAS frequency string for a tcode and tstep."""
+        return '{0:d}{1}'.format(tstep, MAPTCODE[tcode])
+
+    def iter_dsn(self, wdmpath, dsn, chunk=100000, start_date=None,
+                 end_date=None, tcode=None, tstep=None, transform=None,
+                 raw=False):
+        """Yield a DSN in blocks, only holding one block in memory.
+
+        The `chunk` is either the number of values in each block or a PANDAS
+        offset alias, for example 'AS' or '10AS', to start a new block at
+        each calendar boundary.  The other keywords are the same as
+        read_dsn.  Yields DataFrames, or with `raw` the tuple of a float32
+        array (missing values as NaN) and the datetime of the first value.
+
+        The blocks are worked out when the first one is read, and each
+        block is then read on its own.  Nothing is held open or locked
+        between blocks, so the generator can be left before the end or
+        resumed from another thread, and a write to the DSN from another
+        thread between two blocks shows up in the later blocks.
+        """
+        import pandas as pd
+        window = self._read_window(wdmpath, dsn,
+                                   start_date=start_date,
+                                   end_date=end_date,
+                                   tcode=tcode,
+                                   tstep=tstep,
+                                   transform=transform)
+        sdat = window['sdat']
+        nval = window['nval']
+        tcode = window['tcode']
+        tstep = window['tstep']
+        try:
+            chunk = int(chunk)
+            bounds = list(range(chunk, nval, chunk))
+        except ValueError:
+            bounds = []
+            if nval > 0:
+                last = self._timadd(sdat, tcode, tstep, nval - 1)
+                first = pd.Timestamp(datetime.datetime(*sdat))
+                for date in pd.date_range(first.normalize(),
+                                          datetime.datetime(*last),
+                                          freq=chunk):
+                    bounds.append(self._steps_to(sdat,
+                                                 date.to_pydatetime(),
+                                                 tcode,
+                                                 tstep))
+        bounds = sorted(set([0, nval] + bounds))
+
+        for begin, end in zip(bounds[:-1], bounds[1:]):
+            bsdat = self._timadd(sdat, tcode, tstep, begin)
+            # _wdtget holds the file lock for just this block.
+            dataout = self._wdtget(wdmpath, dsn, bsdat, end - begin,
+                                   tcode, tstep, dtran=window['dtran'],
+                                   tsfill=window['tsfill'])
+            if raw:
+                yield dataout, datetime.datetime(*bsdat)
+            else:
+                yield self._to_frame(wdmpath, dsn, dataout,
+                                     datetime.datetime(*bsdat),
+                                     self._freq(tcode, tstep))
 
     def read_dsn_por(self, wdmpath, dsn):
         """Read the period of record for a DSN."""
         return self.read_dsn(wdmpath, dsn, start_date=None, end_date=None)
 
-    def _close(self, wdmpath):
-        """Close the WDM file."""
-        wdmpath = wdmpath.strip()
+    def _close(self, wdmpath, force=False):
+        """Close the WDM file, unless it is held open by a session.
+
+        With keep_open the file is also left open, unless `force` is True.
+        """
+        wdmpath = _abspath(wdmpath)
+        if wdmpath in self.sessions:
+            return
+        if self.keep_open and not force:
+            return
         if wdmpath in self.openfiles:
             retcode = self.wdflcl(self.openfiles[wdmpath])
             self._retcode_check(retcode, additional_info='wdflcl')
             self.openfiles.pop(wdmpath)
+            self.openstamps.pop(wdmpath, None)
+
+    def close_files(self, changed_only=False):
+        """Close the files left open by keep_open.
+
+        With `changed_only`, only the files that were changed or removed
+        since they were opened are closed, so the next call reads them
+        again instead of using the stale WDM record buffer.  Files held by
+        a session stay open.
+        """
+        with self.lock:
+            for wdmpath in list(self.openfiles):
+                if changed_only:
+                    try:
+                        if _stamp(wdmpath) == self.openstamps.get(wdmpath):
+                            continue
+                    except OSError:
+                        pass
+                self._close(wdmpath, force=True)
 
 
 if __name__ == '__main__':
+    import pandas as pd
     wdm_obj = WDM()
     fname = 'test.wdm'
     if os.name == 'nt':